@@ -0,0 +1,332 @@
+# Batch.py - Autoplay for many deals at once, in lockstep, with NumPy
+
+from Board import (Board, CARD_INDEX, EMPTY, RANK, STACK_DOWN, STACK_UP,
+                   NUM_CARDS)
+from Deadlock import find_deadlock
+from Deck import ms_deal
+from Simulator import GameResult
+from Zobrist import KEYS, PILES, FACEUP, FACEDOWN, STOCK, FOUNDATION
+import numpy as np
+import time
+
+# A Batch holds N games as arrays, one row per game, and plays them all with
+# the same hint-following policy as Solitaire.auto_run: every step, each game
+# still going either makes the move its hint search finds first, or draws from
+# the stock. A deal wins or loses here exactly when it does with auto_run.
+
+# Cards are the ints from Board.py, and EMPTY marks an empty column or pile.
+
+# tableau: N x 7 x ROWS cards; only the first length[g, col] of a column count
+# length, faceup: N x 7 card counts, faceup clamped the way Solitaire does
+# talon: N x 24 cards. talon[:ptr] is the draw pile (top card last) and
+#  talon[ptr:size] the stock (next card to draw first)
+# piles: N x 4 top cards of the accumulation piles
+# position, seen, seen_count: Each game's position hash and the positions it
+#  has reached since its last irreversible move (see Solitaire)
+# found: Whether a hint search found a move during the current stock pass
+# active: Games still being played; won, moves, draws and passes are the
+#  results
+# reason: Why each deal was rejected as lost before play (see Deadlock.py),
+#  or None; rejected deals start out inactive, as play_game never plays them
+
+ROWS = 20 # 6 face down cards and a run from king to ace, plus one spare
+TALON = 24
+CANDIDATES = 7 + 4 + 7 * 4 + 7 * ROWS * 7
+
+DOWN = np.frombuffer(bytes(STACK_DOWN), np.uint8).reshape(NUM_CARDS,
+                                                           NUM_CARDS) != 0
+UP = np.frombuffer(bytes(STACK_UP), np.uint8).reshape(NUM_CARDS,
+                                                     NUM_CARDS) != 0
+KING = np.frombuffer(bytes(RANK), np.uint8) == 12
+ZKEYS = np.array(KEYS + [0] * PILES, np.uint64).reshape(NUM_CARDS, PILES)
+
+# Candidate moves, in the order iter_moves yields them. Column to column
+# moves are numbered col * ROWS * 7 + row * 7 + destcol from FIRST_LATERAL.
+FIRST_DRAW_TO_ACCUM = 7
+FIRST_COL_TO_ACCUM = 11
+FIRST_LATERAL = 39
+
+class Batch(object):
+
+    def __init__(self, deals):
+        self.deals = list(deals)
+        n = len(self.deals)
+        self.tableau = np.full((n, 7, ROWS), EMPTY, np.int64)
+        self.length = np.zeros((n, 7), np.int64)
+        self.faceup = np.ones((n, 7), np.int64)
+        self.talon = np.zeros((n, TALON), np.int64)
+        self.size = np.full(n, TALON, np.int64)
+        self.ptr = np.zeros(n, np.int64)
+        self.piles = np.full((n, 4), EMPTY, np.int64)
+        self.found = np.zeros(n, bool)
+        self.active = np.ones(n, bool)
+        self.won = np.zeros(n, bool)
+        self.moves = np.zeros(n, np.int64)
+        self.draws = np.zeros(n, np.int64)
+        self.passes = np.zeros(n, np.int64)
+
+        # Deal the same way Solitaire does: column by column, then the stock
+        cards = np.array([[CARD_INDEX[card] for card in ms_deal(deal)]
+                          for deal in self.deals], np.int64).reshape(n, 52)
+        dealt = 0
+        for col in range(7):
+            self.tableau[:, col, :col + 1] = cards[:, dealt:dealt + col + 1]
+            self.length[:, col] = col + 1
+            dealt += col + 1
+        self.talon[:] = cards[:, dealt:]
+
+        position = np.zeros(n, np.uint64)
+        for col in range(7):
+            for row in range(col + 1):
+                pile = FACEUP + col if row == col else FACEDOWN + col
+                position ^= ZKEYS[self.tableau[:, col, row], pile]
+        for i in range(TALON):
+            position ^= ZKEYS[self.talon[:, i], STOCK]
+        self.position = position
+        self.seen = np.zeros((n, 16), np.uint64)
+
+        self.reason = [find_deadlock(Board.dealt(row))
+                       for row in cards.tolist()]
+        for i, reason in enumerate(self.reason):
+            if reason is not None:
+                self.active[i] = False
+        self.seen[:, 0] = position
+        self.seen_count = np.ones(n, np.int64)
+
+    # tops : int array -> int array
+    # Returns the bottom card of every column of the given games
+    def tops(self, games):
+        length = self.length[games]
+        rows = np.maximum(length - 1, 0)
+        cards = self.tableau[games[:, None], np.arange(7), rows]
+        return np.where(length > 0, cards, EMPTY)
+
+    # draw_card : int array -> int array
+    # Returns the top card of the draw pile of the given games, or EMPTY
+    def draw_card(self, games):
+        ptr = self.ptr[games]
+        cards = self.talon[games, np.maximum(ptr - 1, 0)]
+        return np.where(ptr > 0, cards, EMPTY)
+
+    # legal : int array -> bool array
+    # Returns a games x CANDIDATES table of which candidate moves are legal,
+    # leaving out K-anchored runs moving into an empty column
+    def legal(self, games):
+        tops = self.tops(games)
+        piles = self.piles[games]
+        card = self.draw_card(games)
+        legal = np.zeros((len(games), CANDIDATES), bool)
+        legal[:, :FIRST_DRAW_TO_ACCUM] = DOWN[card[:, None], tops]
+        legal[:, FIRST_DRAW_TO_ACCUM:FIRST_COL_TO_ACCUM] = UP[card[:, None],
+                                                              piles]
+        legal[:, FIRST_COL_TO_ACCUM:FIRST_LATERAL] = UP[
+            tops[:, :, None], piles[:, None, :]].reshape(len(games), 28)
+        # the sentinel never stacks, so empty columns and piles fall out
+
+        length = self.length[games]
+        rows = np.arange(ROWS)
+        down = np.maximum(length - self.faceup[games], 0)
+        lateral = DOWN[self.tableau[games][:, :, :, None],
+                       tops[:, None, None, :]]
+        lateral &= ((rows >= down[:, :, None]) &
+                    (rows < length[:, :, None]))[:, :, :, None]
+        lateral &= ~np.eye(7, dtype=bool)[None, :, None, :]
+        lateral[:, :, 0, :] &= (length != 0)[:, None, :]
+        legal[:, FIRST_LATERAL:] = lateral.reshape(len(games), -1)
+        return legal
+
+    # lateral_hash : int array int array int array int array -> uint64 array
+    # Returns the position each game's column to column move would lead to
+    def lateral_hash(self, games, col, row, dest):
+        rows = np.arange(ROWS)
+        cards = self.tableau[games, col]
+        moving = ((rows >= row[:, None]) &
+                  (rows < self.length[games, col][:, None]))
+        cards = np.where(moving, cards, EMPTY)
+        keys = (ZKEYS[cards, (FACEUP + col)[:, None]] ^
+                ZKEYS[cards, (FACEUP + dest)[:, None]])
+        return self.position[games] ^ np.bitwise_xor.reduce(keys, axis=1)
+
+    # is_seen : int array uint64 array -> bool array
+    def is_seen(self, games, positions):
+        seen = self.seen[games] == positions[:, None]
+        seen &= (np.arange(self.seen.shape[1]) <
+                 self.seen_count[games][:, None])
+        return seen.any(axis=1)
+
+    # hints : int array -> int array
+    # Returns the candidate each game's hint search picks, or -1 for none.
+    # Lateral moves back to a seen position are skipped, as in Solitaire.
+    def hints(self, games):
+        legal = self.legal(games)
+        pick = legal.argmax(axis=1)
+        pick[~legal[np.arange(len(games)), pick]] = -1
+        while True:
+            check = np.nonzero(pick >= FIRST_LATERAL)[0]
+            col, row, dest = np.unravel_index(pick[check] - FIRST_LATERAL,
+                                              (7, ROWS, 7))
+            # moves that turn over a card always lead somewhere new
+            g = games[check]
+            count = self.length[g, col] - row
+            keep = (self.faceup[g, col] - count > 0) | (row == 0)
+            check, col, row, dest = (check[keep], col[keep], row[keep],
+                                     dest[keep])
+            seen = self.is_seen(games[check],
+                                self.lateral_hash(games[check], col, row,
+                                                  dest))
+            if not seen.any(): return pick
+            again = check[seen]
+            legal[again, pick[again]] = False
+            retry = legal[again].argmax(axis=1)
+            retry[~legal[again, retry]] = -1
+            pick[again] = retry
+
+    # advance : int array uint64 array bool array -> void
+    # Moves games to new positions, remembering each one; an irreversible
+    # move forgets every earlier position
+    def advance(self, games, positions, irreversible):
+        self.position[games] = positions
+        reset = games[irreversible]
+        self.seen[reset, 0] = positions[irreversible]
+        self.seen_count[reset] = 1
+
+        keep = ~irreversible
+        keep[keep] = ~self.is_seen(games[keep], positions[keep])
+        add = games[keep]
+        if len(add) == 0: return
+        if self.seen_count[add].max() >= self.seen.shape[1]:
+            self.seen = np.concatenate([self.seen, np.zeros_like(self.seen)],
+                                       axis=1)
+        self.seen[add, self.seen_count[add]] = positions[keep]
+        self.seen_count[add] += 1
+
+    # take_draw_card : int array -> int array
+    # Removes and returns the top card of the draw pile of the given games
+    def take_draw_card(self, games):
+        ptr = self.ptr[games] - 1
+        cards = self.talon[games, ptr]
+        slots = np.arange(TALON)
+        source = np.minimum(slots + (slots >= ptr[:, None]), TALON - 1)
+        self.talon[games] = self.talon[games[:, None], source]
+        self.ptr[games] = ptr
+        self.size[games] -= 1
+        return cards
+
+    # lift : int array int array int -> (uint64 array, bool array)
+    # Updates face up counts for count cards that came off each game's column
+    # and returns the hash change from turning over the card underneath (0
+    # where none was) along with where a card was turned over
+    def lift(self, games, col, count):
+        old = self.faceup[games, col]
+        self.faceup[games, col] = np.maximum(old - count, 1)
+        length = self.length[games, col]
+        flip = (old - count <= 0) & (length > 0)
+        under = self.tableau[games, col, np.maximum(length - 1, 0)]
+        under = np.where(flip, under, EMPTY)
+        return (ZKEYS[under, FACEDOWN + col] ^ ZKEYS[under, FACEUP + col],
+                flip)
+
+    # apply : int array int array -> void
+    # Makes each game's picked candidate move
+    def apply(self, games, pick):
+        self.moves[games] += 1
+        always = np.ones(len(games), bool)
+
+        sel = pick < FIRST_DRAW_TO_ACCUM
+        g, dest = games[sel], pick[sel]
+        if len(g):
+            card = self.take_draw_card(g)
+            self.tableau[g, dest, self.length[g, dest]] = card
+            self.length[g, dest] += 1
+            self.faceup[g, dest] += 1
+            self.advance(g, self.position[g] ^ ZKEYS[card, STOCK] ^
+                         ZKEYS[card, FACEUP + dest], always[sel])
+
+        sel = (pick >= FIRST_DRAW_TO_ACCUM) & (pick < FIRST_COL_TO_ACCUM)
+        g, pile = games[sel], pick[sel] - FIRST_DRAW_TO_ACCUM
+        if len(g):
+            card = self.take_draw_card(g)
+            self.piles[g, pile] = card
+            self.advance(g, self.position[g] ^ ZKEYS[card, STOCK] ^
+                         ZKEYS[card, FOUNDATION], always[sel])
+
+        sel = (pick >= FIRST_COL_TO_ACCUM) & (pick < FIRST_LATERAL)
+        g = games[sel]
+        col, pile = np.divmod(pick[sel] - FIRST_COL_TO_ACCUM, 4)
+        if len(g):
+            self.length[g, col] -= 1
+            card = self.tableau[g, col, self.length[g, col]]
+            self.piles[g, pile] = card
+            flip, flipped = self.lift(g, col, 1)
+            self.advance(g, self.position[g] ^ ZKEYS[card, FACEUP + col] ^
+                         ZKEYS[card, FOUNDATION] ^ flip, flipped)
+
+        sel = pick >= FIRST_LATERAL
+        g = games[sel]
+        col, row, dest = np.unravel_index(pick[sel] - FIRST_LATERAL,
+                                          (7, ROWS, 7))
+        if len(g):
+            positions = self.lateral_hash(g, col, row, dest)
+            count = self.length[g, col] - row
+            start = self.length[g, dest]
+            for i in range(count.max()):
+                part = count > i
+                self.tableau[g[part], dest[part], start[part] + i] = \
+                    self.tableau[g[part], col[part], row[part] + i]
+            self.length[g, col] = row
+            self.length[g, dest] += count
+            self.faceup[g, dest] += count
+            flip, flipped = self.lift(g, col, count)
+            self.advance(g, positions ^ flip, flipped)
+
+    # step : void
+    # Advances every game still being played by one move or draw
+    def step(self):
+        games = np.nonzero(self.active)[0]
+        won = (KING[self.piles[games]]).all(axis=1)
+        self.won[games[won]] = True
+        self.active[games[won]] = False
+        games = games[~won]
+        if len(games) == 0: return
+
+        pick = self.hints(games)
+        hinted = pick >= 0
+        self.found[games[hinted]] = True
+        self.apply(games[hinted], pick[hinted])
+
+        games = games[~hinted]
+        empty = self.ptr[games] == self.size[games]
+        winnable = ((self.size[games] == 0) &
+                    (self.faceup[games] >= self.length[games]).all(axis=1))
+        # a winnable game always has a hint, so it can't get stuck here
+        over = empty & (~self.found[games] | winnable)
+        self.active[games[over]] = False
+
+        recycle = games[empty & ~over]
+        self.ptr[recycle] = 0
+        self.passes[recycle] += 1
+        self.found[recycle] = False
+
+        draw = games[~empty]
+        self.ptr[draw] = np.minimum(self.ptr[draw] + 3, self.size[draw])
+        self.draws[draw] += 1
+
+    # run : void
+    # Plays every game to the end
+    def run(self):
+        while self.active.any():
+            self.step()
+
+# play_deals : int int -> [GameResult]
+# Plays deals first to first + games - 1 as one Batch. Each result's elapsed
+# time is its share of the whole batch's. A Batch keeps no journal, so there
+# are no traces.
+def play_deals(games, first=1):
+    start = time.time()
+    batch = Batch(xrange(first, first + games))
+    batch.run()
+    elapsed = (time.time() - start) / max(games, 1)
+    return [GameResult(deal, bool(batch.won[i]), int(batch.moves[i]),
+                       int(batch.draws[i]), int(batch.passes[i]), elapsed,
+                       None, None, batch.reason[i])
+            for i, deal in enumerate(batch.deals)]
@@ -0,0 +1,169 @@
+# Board.py - Compact integer representation of a Solitaire board
+
+from StockIndex import StockIndex
+from array import array
+
+# Cards are small ints from 0 to 51: suit * 13 + rank, using the same suit and
+# rank order as Deck. EMPTY (52) stands in for the "ZZ" sentinel at the bottom
+# of every column and accumulation pile.
+
+SUITS = "SHCD"
+RANKS = "A23456789TJQK"
+EMPTY = 52
+NUM_CARDS = 53 # 52 cards plus the sentinel
+
+# Lookup tables indexed by card. The sentinel gets a rank and suit that can
+# never match a real card.
+RANK = bytearray(NUM_CARDS)
+SUIT = bytearray(NUM_CARDS)
+RED = bytearray(NUM_CARDS)
+
+# Pair tables indexed by c1 * NUM_CARDS + c2
+# STACK_DOWN: c1 can be placed at the bottom of a column ending in c2
+# STACK_UP: c1 can be placed on top of c2 in an accumulation pile
+STACK_DOWN = bytearray(NUM_CARDS * NUM_CARDS)
+STACK_UP = bytearray(NUM_CARDS * NUM_CARDS)
+
+CARD_INDEX = {"ZZ": EMPTY} # "QH" -> int
+CARD_NAMES = [] # int -> "QH"
+
+for _suit in range(4):
+    for _rank in range(13):
+        CARD_INDEX[RANKS[_rank] + SUITS[_suit]] = len(CARD_NAMES)
+        CARD_NAMES.append(RANKS[_rank] + SUITS[_suit])
+        RANK[_suit * 13 + _rank] = _rank
+        SUIT[_suit * 13 + _rank] = _suit
+        RED[_suit * 13 + _rank] = SUITS[_suit] in "HD"
+CARD_NAMES.append("ZZ")
+RANK[EMPTY] = 99
+SUIT[EMPTY] = 99
+RED[EMPTY] = 99
+
+for _c1 in range(52):
+    for _c2 in range(NUM_CARDS):
+        if _c2 == EMPTY:
+            _down = RANK[_c1] == 12 # only kings start a column
+            _up = RANK[_c1] == 0    # only aces start a pile
+        else:
+            _down = RED[_c1] != RED[_c2] and RANK[_c2] == RANK[_c1] + 1
+            _up = SUIT[_c1] == SUIT[_c2] and RANK[_c1] == RANK[_c2] + 1
+        STACK_DOWN[_c1 * NUM_CARDS + _c2] = _down
+        STACK_UP[_c1 * NUM_CARDS + _c2] = _up
+
+# card_to_int : card -> int
+# Converts a two-character card such as "QH" (or "ZZ") to its integer form
+def card_to_int(card):
+    return CARD_INDEX[card]
+
+# int_to_card : int -> card
+# Converts an integer card back to its two-character form
+def int_to_card(c):
+    return CARD_NAMES[c]
+
+def _ints(cards):
+    return array('b', [CARD_INDEX[c] for c in cards])
+
+def _strs(cards):
+    return [CARD_NAMES[c] for c in cards]
+
+# A Board holds the same layout as Solitaire, card for card, in signed-byte
+# arrays instead of lists of strings.
+
+# columns: Seven arrays, each starting with the EMPTY sentinel
+# faceup: How many cards are face up in each column (same rules as Solitaire)
+# stock: The face down deck; the last element is drawn first
+# draw: Face up draw cards; the last element is the top card
+# stacks: Four accumulation piles, each starting with the EMPTY sentinel
+
+class Board(object):
+    __slots__ = ("columns", "faceup", "stock", "draw", "stacks")
+
+    # __init__ : columns faceup stock draw stacks -> void
+    # Wraps already-converted integer arrays; see from_strings for card strings
+    def __init__(self, columns, faceup, stock, draw, stacks):
+        self.columns = columns
+        self.faceup = faceup
+        self.stock = stock
+        self.draw = draw
+        self.stacks = stacks
+
+    # from_strings : columns faceup stock draw stacks -> Board
+    # Builds a Board from lists laid out like Solitaire's members
+    @classmethod
+    def from_strings(cls, columns, faceup, stock, draw, stacks):
+        return cls([_ints(col) for col in columns], array('b', faceup),
+                   _ints(stock), _ints(draw), [_ints(s) for s in stacks])
+
+    # dealt : [int] -> Board
+    # Deals 52 cards the way Solitaire does, first card first: column by
+    # column, one more card each time, with the rest left in the stock
+    @classmethod
+    def dealt(cls, cards):
+        columns = []
+        i = 0
+        for col in range(7):
+            columns.append(array('b', [EMPTY] + list(cards[i:i + col + 1])))
+            i += col + 1
+        return cls(columns, array('b', [1] * 7), array('b', cards[:i - 1:-1]),
+                   array('b'), [array('b', [EMPTY]) for s in range(4)])
+
+    # from_solitaire : Solitaire -> Board
+    # Takes a snapshot of a game in progress
+    @classmethod
+    def from_solitaire(cls, game):
+        return cls.from_strings(game.columns, game.faceup, game.deck.cards,
+                                game.draw, game.stacks)
+
+    # to_strings : (columns, faceup, stock, draw, stacks)
+    # Returns fresh lists laid out exactly like Solitaire's members
+    def to_strings(self):
+        return ([_strs(col) for col in self.columns], list(self.faceup),
+                _strs(self.stock), _strs(self.draw),
+                [_strs(s) for s in self.stacks])
+
+    # restore : Solitaire -> void
+    # Overwrites a game's card layout with the contents of this board
+    def restore(self, game):
+        (game.columns, game.faceup, game.deck.cards, game.draw,
+         game.stacks) = self.to_strings()
+
+    # copy : Board
+    # Returns an independent copy of this board
+    def copy(self):
+        return Board([array('b', col) for col in self.columns],
+                     array('b', self.faceup), array('b', self.stock),
+                     array('b', self.draw),
+                     [array('b', s) for s in self.stacks])
+
+    # talon_index : StockIndex
+    # Returns an index of the stock and draw pile as they are now
+    def talon_index(self):
+        return StockIndex(self.draw, self.stock)
+
+    # can_stack_up : card card -> bool
+    # Returns whether c1 can be placed on top of c2 in an accumulation pile
+    def can_stack_up(self, c1, c2):
+        return STACK_UP[c1 * NUM_CARDS + c2] == 1
+
+    # can_stack_down : card card -> bool
+    # Returns whether a card can be added to the bottom of a column
+    def can_stack_down(self, c1, c2):
+        return STACK_DOWN[c1 * NUM_CARDS + c2] == 1
+
+    # is_won : bool
+    # Return whether every card has reached the accumulation piles
+    def is_won(self):
+        for stack in self.stacks:
+            if len(stack) != 14: return False
+        return True
+
+    def __eq__(self, other):
+        return (isinstance(other, Board) and
+                self.columns == other.columns and
+                self.faceup == other.faceup and
+                self.stock == other.stock and
+                self.draw == other.draw and
+                self.stacks == other.stacks)
+
+    def __ne__(self, other):
+        return not self == other
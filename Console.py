@@ -0,0 +1,172 @@
+# Console.py - The terminal front end for playing Solitaire
+
+from Instrument import timed
+from Renderer import Renderer, DiffRenderer
+from Results import (OK, BAD_COORDINATE, FACE_DOWN, NO_DRAW_CARD,
+                     BAD_DESTINATION, NO_SUCH_MOVE, ILLEGAL, GAME_OVER,
+                     WINNABLE, NOTHING_TO_UNDO, NOTHING_TO_REDO, WON, LOST,
+                     UNKNOWN, BECAME_WINNABLE, AUTO_MOVED)
+import sys
+
+# A Console plays a Solitaire game at the terminal: it reads commands, hands
+# them to the game, and turns the result codes and events that come back
+# into the board and messages on screen. The game itself never prints.
+
+# game: The Solitaire game being played; the console becomes its listener
+# renderer: Draws the board
+
+MESSAGES = {
+    BAD_COORDINATE: "That's not a valid coordinate. Try again.",
+    FACE_DOWN: "That card isn't uncovered yet. Try again.",
+    NO_DRAW_CARD: "There are no draw cards available. Try again.",
+    BAD_DESTINATION: "Your destination isn't valid. Try again.",
+    NO_SUCH_MOVE: "You can't move from there to there. Try again.",
+    ILLEGAL: "That card can't go there. Try again.",
+    GAME_OVER: "There are no more moves. Thanks for playing!",
+    WINNABLE: "The game is winnable! Nice going! Type 's' to solve.",
+    NOTHING_TO_UNDO: "There's nothing to undo.",
+    NOTHING_TO_REDO: "There's nothing to redo.",
+    LOST: "Sorry, there's no way to win from here.",
+    UNKNOWN: "Sorry, no win turned up in time. Keep playing!",
+    BECAME_WINNABLE: "The game is winnable! Nice going!",
+}
+
+class Console(object):
+
+    def __init__(self, game, renderer=None):
+        self.game = game
+        self.renderer = renderer or Renderer()
+        game.listener = self.notify
+        if game.instrument is not None:
+            game.instrument.install(self) # time rendering too
+
+    # notify : string Solitaire -> void
+    # Shows an event the game reports
+    def notify(self, event, game):
+        if event == AUTO_MOVED:
+            self.printboard()
+        else:
+            self.say(event)
+
+    # say : code -> void
+    # Prints the message for a result code or event, if it has one
+    def say(self, code):
+        message = MESSAGES.get(code)
+        if message is not None: print message
+
+    # printboard : void
+    # Prints board layout in traditional Klondike style
+    @timed("render")
+    def printboard(self):
+        self.renderer.render(self.game)
+
+    # show_hint : void
+    # Prints most recent possible move to screen
+    def show_hint(self):
+        hint = self.game.hint_coords()
+        if len(hint) == 0:
+            print "No hint available! Try drawing more cards."
+        else: sys.stdout.write("Hint: " + hint[0] + " --> " + hint[1] + "\n")
+
+    # show_trace : void
+    # Prints the game's Trace as text, for replaying it or reporting a bug
+    def show_trace(self):
+        from Trace import Trace # Trace builds on Solitaire
+        try:
+            print "Trace: " + Trace.record(self.game).to_text()
+        except ValueError as error:
+            print "No trace: " + str(error)
+
+    # get_input : input -> void
+    # Parses user input and makes the move
+    def get_input(self, move):
+        if len(move) != 2:
+            print "That's not a valid move. Try again."
+            return
+        self.say(self.game.move(move[0].upper(), move[1].upper()))
+
+    def print_intro(self):
+        print ("\n\n\nWelcome to Solitaire!\n" + 
+               "To move cards, enter two coordinates: a source and a destination.\n" +
+               "A coordinate is either two numbers without a space, or a letter code.\n" +
+               "For the letter codes shown below, case does not matter.\n" + 
+               "Columns are addressed first with numbers 1-7,\n" + 
+               "then rows are addressed with numbers 1-19.\n" 
+               + "Accumulation piles are addressed as A1, A2, A3 and A4.\n" +
+               "To draw new cards from the deck, type D.\n" + 
+               "To access the top card of the draw pile, address as DC.\n" + 
+               'Some example moves: "11 22", "DC 54", "32 A3", "719 111".\n' + 
+               'You can undo moves by typing "undo", and redo them with "redo".\n' + 
+               'Type "hint" or "h" to see a possible move, which is helpful when stuck.\n'
+               + 'Type "trace" to get a line of text that replays this game.\n'
+               + 'Type "help" if you want to see this again or "q" to quit. Have fun!\n\n')
+
+    # solve : bool
+    # Finishes the game for the player if it can be won
+    def solve(self):
+        result = self.game.solve()
+        if result != WON:
+            self.say(result)
+            return False
+        self.printboard()
+        print "You've won! Thanks for playing!"
+        return True
+
+    # auto_run : bool
+    # Lets autoplay finish the game, redrawing only what changes
+    def auto_run(self):
+        self.renderer = DiffRenderer()
+        if self.game.auto_run() == WON:
+            self.renderer.render(self.game, True)
+            print "Automated play ended in success!"
+            return True
+        self.renderer.finish(self.game)
+        print "Automated play ended in failure."
+        return False
+
+    # play : bool
+    # Input loop to play game, returns whether or not the game was won
+    def play(self):
+        game = self.game
+        self.print_intro()
+
+        # Generate initial hint
+        game.check_possible_moves()
+
+        while True:
+            self.printboard()
+            ans = raw_input("Enter a move: ")
+            if ans in ["Q", "q", "quit", "exit"]: 
+                exit(1)
+            elif ans in ["d", "D", "draw", "Draw", "DRAW"]: 
+                result = game.draw_cards()
+                self.say(result)
+                if result == GAME_OVER:
+                    return False
+            elif ans in ["hint", "Hint", "HINT", "h", "H"]:
+                self.show_hint()
+            elif ans in ["u", "undo", "UNDO", "Undo"]:
+                if game.undo() == OK:
+                    print "Undid previous move."
+                else:
+                    self.say(NOTHING_TO_UNDO)
+            elif ans in ["r", "redo", "REDO", "Redo"]:
+                if game.redo() == OK:
+                    print "Redid move."
+                else:
+                    self.say(NOTHING_TO_REDO)
+            elif ans in ["s", "solve", "S", "SOLVE"]:
+                if self.solve():
+                    return True
+            elif ans in ["autoplay"]:
+                return self.auto_run()
+            elif ans in ["trace", "Trace", "TRACE"]:
+                self.show_trace()
+            elif ans in ["help", "Help", "HELP"]:
+                self.print_intro()
+            else:
+                self.get_input(ans.split())
+                if game.is_won():
+                    self.printboard()
+                    print "You've won! Thanks for playing!"
+                    return True
@@ -0,0 +1,65 @@
+# Deadlock.py - Spots positions that can never be won, without searching
+
+from Board import NUM_CARDS, RANK, RED, SUIT
+from Moves import iter_moves, is_playable
+
+# Some deals are lost before the first move, and a couple of patterns prove
+# it from the layout alone. find_deadlock looks for them in a Board and
+# returns a reason code, or None if it can't tell. None doesn't mean the
+# game can be won; a reason always means it can't.
+
+# Reasons a position is lost
+DEAD_STOCK = "dead stock"         # nothing can move, and no card the stock
+                                  # can ever bring up can be played
+BLOCKED_COLUMN = "blocked column" # a card can never leave its column, and
+                                  # it covers a card the game needs
+
+# PARENTS[card]: The two cards a card can be placed on in a column (one rank
+# up, the other colour). Kings have none; they go on empty columns.
+PARENTS = [()] * NUM_CARDS
+for _card in range(52):
+    if RANK[_card] < 12:
+        PARENTS[_card] = tuple(suit * 13 + RANK[_card] + 1
+                               for suit in range(4)
+                               if RED[suit * 13] != RED[_card])
+
+# find_deadlock : Board -> string
+# Returns why a position can never be won, or None
+def find_deadlock(board):
+    if is_blocked(board): return BLOCKED_COLUMN
+    if is_dead(board): return DEAD_STOCK
+    return None
+
+# is_blocked : Board -> bool
+# Returns whether some column holds a card that can never move: one with a
+# lower card of its own suit underneath it, so it can't go to the
+# accumulation piles first, and both of the cards it could go on underneath
+# it too. Only cards with nothing face up underneath count, since a face up
+# card underneath could carry it away as part of a run.
+def is_blocked(board):
+    for col in range(7):
+        cards = board.columns[col]
+        lowest = max(1, len(cards) - board.faceup[col])
+        for row in range(2, lowest + 1):
+            card = cards[row]
+            parents = PARENTS[card]
+            if not parents: continue
+            under = cards[1:row]
+            if parents[0] not in under or parents[1] not in under: continue
+            rank = RANK[card]
+            suit = SUIT[card]
+            for other in under:
+                if SUIT[other] == suit and RANK[other] < rank: return True
+    return False
+
+# is_dead : Board -> bool
+# Returns whether nothing on the board can move and no card the stock can
+# bring to the top of the draw pile can be played. Then the cards can only
+# ever go round the stock.
+def is_dead(board):
+    if board.is_won(): return False
+    if next(iter_moves(board, True), None) is not None: return False
+    tops = [col[-1] for col in board.columns]
+    for card, draws in board.talon_index().reachable(len(board.draw)):
+        if is_playable(board, card, tops): return False
+    return True
@@ -6,13 +6,87 @@ import random
 
 # A Deck represents a stack of 52 face down standard playing cards
 
+# Every deal can be rebuilt from one number. A Deck made with a seed is
+# shuffled with its own random.Random(seed), and a Deck made with a deal is
+# dealt the way Microsoft's games number their deals. Either way, rank()
+# gives the deck's position among all 52! orderings, and from_rank turns that
+# back into the same deck.
+
+# cards: The cards left in the deck; the last card is drawn first
+# order: The cards in the order they were dealt, before any were drawn, or
+#  None if that isn't known (a game loaded from a Snapshot)
+# seed, deal: Whatever the deck was built from, or None
+#  (a deck can also be built from an explicit list of cards)
+
+ORDERED = [rank + suit for suit in "SHCD" for rank in "A23456789TJQK"]
+
+# Microsoft's deals number the cards rank-major, clubs first
+MS_CARDS = [rank + suit for rank in "A23456789TJQK" for suit in "CDHS"]
+
+FACTORIALS = [1]
+for _n in range(1, 53):
+    FACTORIALS.append(FACTORIALS[-1] * _n)
+
+# ms_deal : int -> [card]
+# Returns the cards of Microsoft-style deal n, first card dealt first
+def ms_deal(n):
+    cards = list(MS_CARDS)
+    dealt = []
+    seed = n
+    for left in range(52, 0, -1):
+        seed = (seed * 214013 + 2531011) & 0x7fffffff
+        j = (seed >> 16) % left
+        dealt.append(cards[j])
+        cards[j] = cards[left - 1]
+    return dealt
+
 class Deck:
-        def __init__(self):
-                self.cards = []
-                for suit in "SHCD":
-                        for rank in "A23456789TJQK":
-                                card = rank + suit
-                                self.cards.append(card)
-                random.shuffle(self.cards)
+        def __init__(self, seed=None, deal=None, cards=None):
+                self.seed = seed
+                self.deal = deal
+                if cards is not None:
+                        self.cards = list(cards)
+                elif deal is not None:
+                        self.cards = ms_deal(deal)
+                        self.cards.reverse() # first card dealt is drawn first
+                else:
+                        self.cards = list(ORDERED)
+                        if seed is not None:
+                                random.Random(seed).shuffle(self.cards)
+                        else:
+                                random.shuffle(self.cards)
+                self.order = tuple(self.cards)
+
+        # from_rank : int -> Deck
+        # Builds the deck whose rank() is the given number
+        @classmethod
+        def from_rank(cls, rank):
+                if not 0 <= rank < FACTORIALS[52]:
+                        raise ValueError("deal rank out of range")
+                remaining = list(ORDERED)
+                cards = []
+                for left in range(51, -1, -1):
+                        i, rank = divmod(rank, FACTORIALS[left])
+                        cards.append(remaining.pop(i))
+                return cls(cards=cards)
+
+        # rank : int
+        # Returns this deal's index among all 52! orderings of the deck. A
+        # deck whose order isn't known is rebuilt from its deal number; with
+        # neither, there's no way to tell and it raises ValueError.
+        def rank(self):
+                if self.order is None:
+                        if self.deal is None:
+                                raise ValueError("this deck's order isn't "
+                                                 "known")
+                        return Deck(deal=self.deal).rank()
+                remaining = list(ORDERED)
+                rank = 0
+                for left, card in zip(range(51, -1, -1), self.order):
+                        i = remaining.index(card)
+                        rank += i * FACTORIALS[left]
+                        del remaining[i]
+                return rank
+
         def draw(self):
-                return self.cards.pop()
\ No newline at end of file
+                return self.cards.pop()
@@ -0,0 +1,343 @@
+# GameServer.py - Hosts many Solitaire sessions in one process over a socket
+
+from Moves import Move
+from Solitaire import Solitaire
+from Results import GAME_OVER
+from Solver import Solver, WON
+from multiprocessing import Pool
+import Moves
+import Queue
+import Snapshot
+import asynchat
+import asyncore
+import base64
+import binascii
+import json
+import os
+import socket
+import time
+
+# Clients talk to the server one JSON object per line, and get one JSON
+# object per line back. Every request has a "cmd" and, apart from "new", the
+# "session" it is for; an "id", if given, is echoed in the reply. Replies
+# have "ok", plus "error" when it's False, and most carry the game's "state".
+# Sessions outlive connections, so a client can reconnect and carry on.
+
+# new [deal]        Deals a game and returns its session
+# new snapshot      Loads a game saved with "save"
+# state             Returns the game as the player sees it
+# move from to      Makes a move given as coordinates, e.g. "32" "A3"
+# draw              Draws from the stock, or turns it over
+# hint              Returns the current hint, or null
+# undo, redo        Steps back or forward one move or draw
+# solve [max_nodes] [max_time]
+#                   Finishes the game if it can be won. Searches run in a
+#                   pool of worker processes so other clients aren't held up.
+# save              Returns the game as a base64 Snapshot
+# close             Ends the session
+
+# Sessions nobody has used for idle_timeout seconds are evicted.
+
+MAX_LINE = 4096 # longest request line accepted
+MAX_DEAL = 0xffffffff # deal numbers have to fit in a Snapshot
+
+# A Session is one game being played through the server.
+
+# game: The Solitaire game
+# used: When a request for this session last came in
+# solving: Whether a solve for this session is in a worker
+
+class Session(object):
+    __slots__ = ("game", "used", "solving")
+
+    def __init__(self, game):
+        self.game = game
+        self.used = time.time()
+        self.solving = False
+
+# state : Solitaire -> dict
+# Describes a game as the player sees it, with face down cards hidden
+def state(game):
+    columns = []
+    for col in range(7):
+        cards = game.columns[col][1:]
+        down = max(0, len(cards) - game.faceup[col])
+        columns.append(["??"] * down + cards[down:])
+    return {
+        "columns": columns,
+        "draw": game.draw[-3:],
+        "stock": len(game.deck.cards),
+        "stacks": [stack[-1] if len(stack) > 1 else None
+                   for stack in game.stacks],
+        "hint": game.hint_coords() or None,
+        "moves": len(game.journal),
+        "won": game.is_won(),
+        "over": game.is_over(),
+        "winnable": game.is_winnable(),
+    }
+
+# solve_position : (string, int, number) -> (string, [tuple], int)
+# Runs in a worker process: searches for a win from a position given as a
+# Snapshot and returns the status, the winning moves as
+# (kind, src, row, dst) tuples, and the nodes searched. A search that fails
+# comes back with the status "error", since the pool has no way to report it.
+def solve_position(task):
+    snapshot, max_nodes, max_time = task
+    try:
+        board = Snapshot.unpack_board(snapshot)
+        result = Solver(max_nodes, max_time).solve(board)
+    except Exception:
+        return ("error", [], 0)
+    return (result.status,
+            [(m.kind, m.src, m.row, m.dst) for m in result.moves],
+            result.nodes)
+
+# A Channel is one client connection. It splits what comes in into lines,
+# hands each to the server, and writes back whatever replies it gets.
+
+class Channel(asynchat.async_chat):
+
+    def __init__(self, sock, server):
+        asynchat.async_chat.__init__(self, sock, map=server.map)
+        self.server = server
+        self.buffer = []
+        self.size = 0
+        self.set_terminator("\n")
+
+    def collect_incoming_data(self, data):
+        self.size += len(data)
+        if self.size > MAX_LINE:
+            self.reply({"ok": False, "error": "request too long"})
+            self.close_when_done()
+            return
+        self.buffer.append(data)
+
+    def found_terminator(self):
+        line = "".join(self.buffer).strip()
+        self.buffer = []
+        self.size = 0
+        if line:
+            reply = self.server.handle_line(self, line)
+            if reply is not None: self.reply(reply)
+
+    # reply : dict -> void
+    def reply(self, message):
+        if self.connected:
+            self.push(json.dumps(message) + "\n")
+
+    def handle_close(self):
+        self.close()
+
+# A GameServer listens on a TCP port or a Unix socket and runs every session
+# on one thread, between calls to asyncore.
+
+# sessions: Session id -> Session
+# pool: Worker processes for solve requests
+# solved: Finished solves waiting to be handed back to the event loop
+
+class GameServer(asyncore.dispatcher):
+
+    def __init__(self, address, idle_timeout=600, workers=None):
+        self.map = {}
+        self.sessions = {}
+        self.idle_timeout = idle_timeout
+        self.solved = Queue.Queue()
+        self.evicted_at = time.time()
+        # Start the workers before the socket opens, so they don't hold it
+        self.pool = Pool(workers)
+        asyncore.dispatcher.__init__(self, map=self.map)
+        if isinstance(address, tuple):
+            self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.set_reuse_addr()
+        else:
+            if os.path.exists(address): os.unlink(address)
+            self.create_socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.bind(address)
+        self.listen(128)
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            Channel(pair[0], self)
+
+    # serve_forever : number -> void
+    # Runs the event loop until every socket is closed
+    def serve_forever(self, poll=0.05):
+        try:
+            while self.map:
+                self.serve_once(poll)
+        finally:
+            self.shut_down()
+
+    # serve_once : number -> void
+    # Waits up to poll seconds for sockets to be ready and serves them, then
+    # hands back finished solves and evicts idle sessions. It uses poll()
+    # rather than select(), which can't watch descriptors numbered past
+    # FD_SETSIZE (usually 1024).
+    def serve_once(self, poll=0.05):
+        asyncore.loop(poll, True, self.map, 1)
+        self.deliver_solved()
+        self.evict_idle()
+
+    # shut_down : void
+    def shut_down(self):
+        for channel in self.map.values():
+            channel.close()
+        self.pool.terminate()
+        self.pool.join()
+
+    # evict_idle : void
+    # Drops sessions that have gone unused for too long, checking at most
+    # once a second
+    def evict_idle(self):
+        now = time.time()
+        if now - self.evicted_at < 1: return
+        self.evicted_at = now
+        for key, session in self.sessions.items():
+            if now - session.used > self.idle_timeout and not session.solving:
+                del self.sessions[key]
+
+    # handle_line : Channel string -> dict
+    # Runs one request, returning the reply, or None if it comes later. A
+    # command that raises gets an error reply instead of taking the
+    # connection down with it.
+    def handle_line(self, channel, line):
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {"ok": False, "error": "not JSON"}
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "not a JSON object"}
+        try:
+            reply = self.handle_request(channel, request)
+        except Exception as error:
+            reply = {"ok": False, "error": "internal error: %s: %s" % (
+                type(error).__name__, error)}
+        if reply is not None and "id" in request:
+            reply["id"] = request["id"]
+        return reply
+
+    # handle_request : Channel dict -> dict
+    def handle_request(self, channel, request):
+        cmd = request.get("cmd")
+        if cmd == "new":
+            deal = request.get("deal")
+            if deal is not None and not isinstance(deal, (int, long)):
+                return {"ok": False, "error": "deal must be a number"}
+            if deal is not None and not 0 <= deal <= MAX_DEAL:
+                return {"ok": False, "error": "deal out of range"}
+            key = binascii.hexlify(os.urandom(8))
+            if "snapshot" in request:
+                try:
+                    game = Snapshot.unpack(base64.b64decode(
+                        request["snapshot"]))
+                except (TypeError, ValueError):
+                    return {"ok": False, "error": "bad snapshot"}
+            else:
+                game = Solitaire(deal=deal)
+                game.check_possible_moves()
+            # the game has to describe itself before it gets a session
+            reply = {"ok": True, "session": key, "deal": game.deck.deal,
+                     "state": state(game)}
+            self.sessions[key] = Session(game)
+            return reply
+
+        session = self.sessions.get(request.get("session"))
+        if session is None:
+            return {"ok": False, "error": "no such session"}
+        session.used = time.time()
+        game = session.game
+
+        if cmd == "state" or cmd == "hint":
+            pass
+        elif cmd == "move":
+            move = self.find_move(game, request.get("from"), request.get("to"))
+            if move is None:
+                return {"ok": False, "error": "illegal move"}
+            game.apply_move(move)
+        elif cmd == "draw":
+            if game.draw_cards() == GAME_OVER:
+                return {"ok": False, "error": "no more moves",
+                        "state": state(game)}
+        elif cmd == "undo":
+            if not game.journal.can_undo():
+                return {"ok": False, "error": "nothing to undo"}
+            game.undo()
+        elif cmd == "redo":
+            if not game.journal.can_redo():
+                return {"ok": False, "error": "nothing to redo"}
+            game.redo()
+        elif cmd == "save":
+            return {"ok": True,
+                    "snapshot": base64.b64encode(Snapshot.pack(game))}
+        elif cmd == "solve":
+            return self.start_solve(channel, session, request)
+        elif cmd == "close":
+            del self.sessions[request["session"]]
+            return {"ok": True}
+        else:
+            return {"ok": False, "error": "unknown command"}
+        return {"ok": True, "state": state(game)}
+
+    # find_move : Solitaire string string -> Move
+    # Returns the legal move with the given coordinates, or None
+    def find_move(self, game, source, dest):
+        if not isinstance(source, basestring) or not isinstance(dest,
+                                                                basestring):
+            return None
+        coords = [source.upper(), dest.upper()]
+        for move in Moves.legal_moves(game):
+            if move.coords(game) == coords:
+                return move
+        return None
+
+    # start_solve : Channel Session dict -> dict
+    # Finishes a winnable game at once; otherwise sends the position to a
+    # worker and replies when it's done
+    def start_solve(self, channel, session, request):
+        game = session.game
+        if game.is_winnable():
+            game.solve()
+            return {"ok": True, "status": WON, "state": state(game)}
+        if session.solving:
+            return {"ok": False, "error": "already solving"}
+        try:
+            max_nodes = int(request.get("max_nodes", 200000))
+            max_time = float(request.get("max_time", 10))
+        except (TypeError, ValueError):
+            return {"ok": False, "error": "bad limits"}
+        session.solving = True
+        task = (Snapshot.pack(game), max_nodes, max_time)
+        pending = (channel, request.get("id"), session, len(game.journal),
+                   game.position)
+        self.pool.apply_async(solve_position, (task,),
+                              callback=lambda result:
+                              self.solved.put((pending, result)))
+        return None
+
+    # deliver_solved : void
+    # Plays out and replies to the solves the workers have finished. The
+    # pool calls back on its own thread, so results wait in a queue for the
+    # event loop.
+    def deliver_solved(self):
+        while True:
+            try:
+                pending, result = self.solved.get_nowait()
+            except Queue.Empty:
+                return
+            channel, request_id, session, moves, position = pending
+            session.solving = False
+            session.used = time.time()
+            game = session.game
+            status, solution, nodes = result
+            if len(game.journal) != moves or game.position != position:
+                reply = {"ok": False, "error": "the game changed while solving"}
+            else:
+                if status == WON:
+                    for move in solution:
+                        game.apply_move(Move(*move))
+                reply = {"ok": status != "error", "status": status,
+                         "nodes": nodes, "state": state(game)}
+            if request_id is not None:
+                reply["id"] = request_id
+            channel.reply(reply)
@@ -0,0 +1,147 @@
+# HintEngine.py - Ranks hint moves by looking a few moves ahead
+
+from Board import Board, NUM_CARDS, STACK_DOWN
+from Moves import COL_TO_COL, DRAW_UNTIL
+from Policy import Policy
+from Solver import Solver
+from Zobrist import board_hash
+import time
+
+# A HintEngine is a Policy that picks the best of the moves a hint search
+# turned up. Each one is made on a Board copy of the game and valued as the
+# score of the position it leads to plus the best score the Solver's move
+# list can reach from there within a few more moves. Draws are left out of
+# the lookahead; the score rates the stock instead. The search deepens one
+# move at a time until max_depth or the time budget runs out, and the
+# deepest search that finished decides. Ties go to the move found first.
+
+# A column to column move that can't lead to a better position than the
+# current one isn't suggested at all, so autoplay draws instead, and a pass
+# through the stock with nothing better to do ends the game.
+
+# budget: Seconds one call may spend looking ahead (None means no limit)
+# max_depth: Moves to look ahead after the move being scored
+
+# Score weights
+FOUNDATION_WEIGHT = 10 # per card on the accumulation piles
+FACEDOWN_WEIGHT = 5    # per face down card
+TALON_WEIGHT = 2       # per card left in the stock and draw pile
+REACHABLE_WEIGHT = 1   # per playable card a pass through the stock turns up
+
+class HintEngine(Solver, Policy):
+    name = "lookahead"
+
+    def __init__(self, budget=0.05, max_depth=2):
+        Solver.__init__(self, max_nodes=None, max_time=budget)
+        self.budget = budget
+        self.max_depth = max_depth
+        self.deadline = None
+        self.nodes = 0
+
+    # best_move : game [Move] -> Move
+    # Returns the best of the given moves on a Solitaire game or a Board, or
+    # None if none of them is worth making
+    def best_move(self, game, moves):
+        if not moves: return None
+        if isinstance(game, Board):
+            self.board = game.copy()
+        else:
+            self.board = Board.from_solitaire(game)
+        self.hash = board_hash(self.board)
+        self.nodes = 0
+        self.deadline = None
+        if self.budget is not None:
+            self.deadline = time.time() + self.budget
+
+        values = [self.value(move, 0) for move in moves]
+        for depth in range(1, self.max_depth + 1):
+            deeper = []
+            for move in moves:
+                value = self.value(move, depth)
+                if value is None: break
+                deeper.append(value)
+            else:
+                values = deeper
+                continue
+            break
+
+        best = 0
+        for i in range(1, len(moves)):
+            if values[i] > values[best]: best = i
+        if (moves[best].kind == COL_TO_COL and
+                values[best] <= 2 * self.score()): # no better than staying
+            return None
+        return moves[best]
+
+    choose = best_move
+
+    # value : Move int -> int
+    # Values a move by the score it leads to plus the best score reachable
+    # within depth more moves, or returns None if time ran out
+    def value(self, move, depth):
+        old = self.hash
+        token = self.play(move)
+        value = self.lookahead(depth, set([self.hash]))
+        if value is not None: value += self.score()
+        self.unplay(move, token)
+        self.hash = old
+        return value
+
+    # lookahead : int set -> int
+    # Returns the best score reachable from the board within depth moves
+    # (not counting draws) without revisiting a position, or None if time
+    # ran out
+    def lookahead(self, depth, visited):
+        best = self.score()
+        if depth == 0 or self.is_won(): return best
+        if self.deadline is not None and time.time() > self.deadline:
+            return None
+        for move in self.candidates():
+            if move.kind == DRAW_UNTIL: continue
+            old = self.hash
+            token = self.play(move)
+            self.nodes += 1
+            if self.hash not in visited:
+                visited.add(self.hash)
+                value = self.lookahead(depth - 1, visited)
+                if value is None:
+                    self.unplay(move, token)
+                    self.hash = old
+                    return None
+                if value > best: best = value
+            self.unplay(move, token)
+            self.hash = old
+        return best
+
+    # score : int
+    # Rates the board: cards on the accumulation piles, face down cards, cards
+    # still in the stock and draw pile, and how many of the cards a pass
+    # through the stock would turn up could be played
+    def score(self):
+        board = self.board
+        score = 0
+        for stack in board.stacks:
+            score += FOUNDATION_WEIGHT * (len(stack) - 1)
+        tops = []
+        for col in range(7):
+            cards = board.columns[col]
+            score -= FACEDOWN_WEIGHT * max(0, len(cards) - 1 -
+                                           board.faceup[col])
+            tops.append(cards[-1])
+
+        # The next pass draws the draw pile from the bottom, then the stock
+        talon = list(board.draw)
+        talon.extend(reversed(board.stock))
+        score -= TALON_WEIGHT * len(talon)
+        shown = range(2, len(talon), 3)
+        if len(talon) % 3: shown.append(len(talon) - 1)
+        for i in shown:
+            card = talon[i]
+            if self.foundation_for(card) >= 0:
+                score += REACHABLE_WEIGHT
+                continue
+            for top in tops:
+                if STACK_DOWN[card * NUM_CARDS + top]:
+                    score += REACHABLE_WEIGHT
+                    break
+        return score
@@ -0,0 +1,138 @@
+# Instrument.py - Opt-in counters, phase timings and profiling for Solitaire
+
+from functools import wraps
+from timeit import default_timer
+import cProfile
+
+# An Instrument is attached to a game with Solitaire(instrument=Instrument())
+# or instrument.attach(game). Attaching wraps the game's timed methods on the
+# game itself, so games without one run the plain methods, and only pay an
+# attribute check where they count events.
+
+# counters: Named event counts (see COUNTERS)
+# hint_checks, hint_candidates, hint_depth_max: How many hint searches ran,
+#  how many candidate moves they looked at in total, and the most any one
+#  search looked at before finding a hint or giving up
+# phases: Phase name -> [calls, seconds]. Phases nest (a move runs a hint
+#  search), so a phase's time includes any phases inside it.
+# profiler: A cProfile.Profile that runs during auto_run and solve, or None
+
+COUNTERS = ("journal_entries", "draws", "stock_recycles")
+
+class Instrument(object):
+
+    def __init__(self, profile=False):
+        self.counters = dict((name, 0) for name in COUNTERS)
+        self.hint_checks = 0
+        self.hint_candidates = 0
+        self.hint_depth_max = 0
+        self.phases = {}
+        self.profiler = cProfile.Profile() if profile else None
+        self.profiling = False
+
+    # count : string -> void
+    def count(self, name):
+        self.counters[name] += 1
+
+    # hint_search : int -> void
+    # Records one hint search that looked at the given number of candidates
+    def hint_search(self, candidates):
+        self.hint_checks += 1
+        self.hint_candidates += candidates
+        if candidates > self.hint_depth_max:
+            self.hint_depth_max = candidates
+
+    # call : string bool function object tuple dict -> value
+    # Calls method(game, *args, **kwargs), timing it under the given phase
+    # and profiling it if asked to (and not already profiling)
+    def call(self, phase, profile, method, game, args, kwargs):
+        profile = profile and self.profiler is not None and not self.profiling
+        if profile:
+            self.profiling = True
+            self.profiler.enable()
+        start = default_timer()
+        try:
+            return method(game, *args, **kwargs)
+        finally:
+            elapsed = default_timer() - start
+            if profile:
+                self.profiler.disable()
+                self.profiling = False
+            totals = self.phases.get(phase)
+            if totals is None:
+                self.phases[phase] = [1, elapsed]
+            else:
+                totals[0] += 1
+                totals[1] += elapsed
+
+    # attach : Solitaire -> void
+    # Starts recording a game's counters and timings
+    def attach(self, game):
+        game.instrument = self
+        self.install(game)
+
+    # detach : Solitaire -> void
+    # Stops recording a game
+    def detach(self, game):
+        game.instrument = None
+        for name in timed_methods(game):
+            if name in game.__dict__: del game.__dict__[name]
+
+    # install : object -> void
+    # Replaces each of an object's timed methods, on the object alone, with
+    # one that times it under its phase
+    def install(self, obj):
+        for name, (phase, profile) in timed_methods(obj).items():
+            setattr(obj, name, self.wrap(phase, profile,
+                                         getattr(obj.__class__, name), obj))
+
+    # wrap : string bool method object -> function
+    def wrap(self, phase, profile, method, obj):
+        function = method.im_func
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            return self.call(phase, profile, function, obj, args, kwargs)
+        return wrapper
+
+    # snapshot : dict
+    # Returns everything recorded so far as plain data
+    def snapshot(self):
+        checks = self.hint_checks
+        return {
+            "counters": dict(self.counters),
+            "hint_search": {
+                "checks": checks,
+                "candidates": self.hint_candidates,
+                "mean_depth": float(self.hint_candidates) / checks
+                              if checks else 0.0,
+                "max_depth": self.hint_depth_max,
+            },
+            "phases": dict((name, {"calls": calls, "seconds": seconds})
+                           for name, (calls, seconds) in self.phases.items()),
+        }
+
+    # dump_stats : path -> void
+    # Writes the profile in the format pstats and other cProfile tools read
+    def dump_stats(self, path):
+        self.profiler.dump_stats(path)
+
+# timed : string bool -> decorator
+# Marks a method to be timed as a phase once an Instrument is installed on
+# its object. With profile set, the method also runs under the Instrument's
+# profiler. The method itself is left as it is.
+def timed(phase, profile=False):
+    def decorate(method):
+        method.timed = (phase, profile)
+        return method
+    return decorate
+
+# timed_methods : object -> dict
+# Returns name -> (phase, profile) for an object's timed methods
+def timed_methods(obj):
+    cls = obj.__class__
+    methods = {}
+    for name in dir(cls):
+        timing = getattr(getattr(cls, name), "timed", None)
+        if timing is not None:
+            methods[name] = timing
+    return methods
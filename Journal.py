@@ -0,0 +1,77 @@
+# Journal.py - Append-only journal of reversible moves for undo and redo
+
+# An Entry records just enough about one move or draw to reverse it.
+
+# move: The Move that was made (kind DRAW for draws and stock recycles)
+# count: Cards moved or drawn; 0 marks a recycle of the stock
+# src_faceup, dst_faceup: Face-up counts of the source and destination
+#  columns before the move, or None when that end isn't a column
+# position: The position hash before the move
+# seen: The seen-position set an irreversible move replaced, or None
+# added: Whether the move added a new position to the seen set
+# hint_move, winnable_is_known: Values to put back on undo
+# pass_hints, pass_positions: The stock pass counters before the move
+
+class Entry(object):
+    __slots__ = ("move", "count", "src_faceup", "dst_faceup", "position",
+                 "seen", "added", "hint_move", "pass_hints",
+                 "pass_positions", "winnable_is_known")
+
+    def __init__(self, move, count):
+        self.move = move
+        self.count = count
+        self.src_faceup = None
+        self.dst_faceup = None
+        self.position = 0
+        self.seen = None
+        self.added = False
+        self.hint_move = None
+        self.pass_hints = 0
+        self.pass_positions = 0
+        self.winnable_is_known = False
+
+# A Journal keeps the entries that can be undone, most recent last, and the
+# entries that were undone and can still be redone.
+
+class Journal(object):
+    __slots__ = ("done", "undone", "redoing")
+
+    def __init__(self):
+        self.done = []
+        self.undone = []
+        self.redoing = False
+
+    # record : Entry -> void
+    # Appends an entry. A new move discards the redo list, unless the move is
+    # itself a redo.
+    def record(self, entry):
+        self.done.append(entry)
+        if self.redoing:
+            self.redoing = False
+        elif self.undone:
+            self.undone = []
+
+    # can_undo : bool
+    def can_undo(self):
+        return len(self.done) > 0
+
+    # can_redo : bool
+    def can_redo(self):
+        return len(self.undone) > 0
+
+    # undo : Entry
+    # Pops the most recent entry for the caller to reverse
+    def undo(self):
+        entry = self.done.pop()
+        self.undone.append(entry)
+        return entry
+
+    # redo : Entry
+    # Pops the most recently undone entry for the caller to make again; the
+    # entry that move records keeps the rest of the redo list intact
+    def redo(self):
+        self.redoing = True
+        return self.undone.pop()
+
+    def __len__(self):
+        return len(self.done)
@@ -0,0 +1,136 @@
+# Moves.py - Move objects and a move generator that works on column indices
+
+# Move kinds
+DRAW_TO_COL = 0
+DRAW_TO_ACCUM = 1
+COL_TO_ACCUM = 2
+COL_TO_COL = 3
+ACCUM_TO_COL = 4
+DRAW = 5 # draw from the stock, or turn it over once it's empty
+DRAW_UNTIL = 6 # draw row times, bringing card src to the top of the draw pile
+
+# A Move names its source and destination by index rather than by coordinate
+# string.
+
+# kind: One of the move kinds above
+# src: Column or accumulation pile the card(s) come from (unused for draws)
+# row: Index of the first moving card in the source column (columns only)
+# dst: Column or accumulation pile the card(s) go to
+
+class Move(object):
+    __slots__ = ("kind", "src", "row", "dst")
+
+    def __init__(self, kind, src, row, dst):
+        self.kind = kind
+        self.src = src
+        self.row = row
+        self.dst = dst
+
+    # coords : game -> [move, move]
+    # Returns the coordinate strings parse_move would accept for this move.
+    # Destination rows depend on the current column length, so call this
+    # before the move is made.
+    def coords(self, game):
+        kind = self.kind
+        if kind == DRAW_TO_COL or kind == DRAW_TO_ACCUM:
+            source = "DC"
+        elif kind == ACCUM_TO_COL:
+            source = "A" + str(self.src + 1)
+        else:
+            source = str(self.src + 1) + str(self.row)
+        if kind == DRAW_TO_ACCUM or kind == COL_TO_ACCUM:
+            dest = "A" + str(self.dst + 1)
+        else:
+            dest = str(self.dst + 1) + str(len(game.columns[self.dst]))
+        return [source, dest]
+
+    def __eq__(self, other):
+        return (isinstance(other, Move) and self.kind == other.kind and
+                self.src == other.src and self.row == other.row and
+                self.dst == other.dst)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.kind, self.src, self.row, self.dst))
+
+    def __repr__(self):
+        return "Move(%d, %r, %r, %r)" % (self.kind, self.src, self.row,
+                                         self.dst)
+
+# iter_moves : game bool -> generator
+# Yields every legal move on a Solitaire or Board, in the order the hint
+# engine has always tried them: draw card to columns, draw card to piles,
+# column tops to piles, then column to column. Moves off the accumulation
+# piles are only included when from_accum is True. With from_stock, the
+# moves end with a DRAW_UNTIL for every card further on in the stock that
+# could be played once it comes up, soonest first.
+def iter_moves(game, from_accum=False, from_stock=False):
+    columns = game.columns
+    faceup = game.faceup
+    stacks = game.stacks
+    draw = game.draw
+    can_stack_down = game.can_stack_down
+    can_stack_up = game.can_stack_up
+    tops = [col[-1] for col in columns]
+
+    # Try moving the draw card to every position
+    if draw:
+        card = draw[-1]
+        for col in range(7):
+            if can_stack_down(card, tops[col]):
+                yield Move(DRAW_TO_COL, None, None, col)
+
+        # Try moving the draw card to every stack
+        for stack in range(4):
+            if can_stack_up(card, stacks[stack][-1]):
+                yield Move(DRAW_TO_ACCUM, None, None, stack)
+
+    # Try moving every top card to every stack
+    for col in range(7):
+        row = len(columns[col]) - 1
+        if row == 0: continue # only the sentinel is left
+        for stack in range(4):
+            if can_stack_up(tops[col], stacks[stack][-1]):
+                yield Move(COL_TO_ACCUM, col, row, stack)
+
+    # Try moving every face up run to every other column
+    for col in range(7):
+        cards = columns[col]
+        length = len(cards)
+        for row in range(max(1, length - faceup[col]), length):
+            card = cards[row]
+            for destcol in range(7):
+                if destcol == col: continue
+                if can_stack_down(card, tops[destcol]):
+                    yield Move(COL_TO_COL, col, row, destcol)
+
+    # Try moving every accumulation pile's top card back down
+    if from_accum:
+        for stack in range(4):
+            card = stacks[stack][-1]
+            for col in range(7):
+                if can_stack_down(card, tops[col]):
+                    yield Move(ACCUM_TO_COL, stack, None, col)
+
+    # Try drawing until every playable card comes up
+    if from_stock:
+        for card, draws in game.talon_index().reachable(len(draw)):
+            if draws > 0 and is_playable(game, card, tops):
+                yield Move(DRAW_UNTIL, card, draws, None)
+
+# is_playable : game card [card] -> bool
+# Returns whether a card could go on a column (with the given bottom cards)
+# or an accumulation pile
+def is_playable(game, card, tops):
+    for top in tops:
+        if game.can_stack_down(card, top): return True
+    for stack in game.stacks:
+        if game.can_stack_up(card, stack[-1]): return True
+    return False
+
+# legal_moves : game -> [Move]
+# Lists every legal move, including moves off the accumulation piles
+def legal_moves(game):
+    return list(iter_moves(game, True))
@@ -0,0 +1,77 @@
+# Policy.py - Autoplay strategies
+
+from Moves import COL_TO_ACCUM, DRAW_TO_ACCUM, COL_TO_COL
+import random
+
+# A Policy decides what autoplay (and the hint) does next. Whenever the hint
+# search runs, choose gets the game and the moves it allows, in the order
+# the hint engine has always tried them (no moves off the accumulation
+# piles, and no column to column move back to a position already seen),
+# pruned by Prune.prune: just a safe move to the accumulation piles if there
+# is one, and otherwise one move per empty pile or column choice. It returns
+# one of them, or None to draw instead. Give one to a game with
+# Solitaire(policy=...). A game without one takes the first move, unpruned.
+
+# Policies travel to worker processes, so they should pickle, and they must
+# not keep anything from one game to the next that changes how they play.
+
+class Policy(object):
+    name = "policy"
+
+    # choose : Solitaire [Move] -> Move
+    def choose(self, game, moves):
+        raise NotImplementedError
+
+# FirstMove plays the way Solitaire does on its own, except that it makes
+# safe moves to the accumulation piles first.
+
+class FirstMove(Policy):
+    name = "first"
+
+    def choose(self, game, moves):
+        return moves[0] if moves else None
+
+# RandomMove picks any of the moves, seeded by the deal so that a deal is
+# always played the same way.
+
+class RandomMove(Policy):
+    name = "random"
+
+    def __init__(self, seed=0):
+        self.seed = seed
+        self.rng = None
+        self.deal = None
+
+    def choose(self, game, moves):
+        if not moves: return None
+        if self.rng is None or self.deal != game.deck.deal:
+            self.deal = game.deck.deal
+            self.rng = random.Random((self.seed, self.deal))
+        return self.rng.choice(moves)
+
+# Greedy plays to the accumulation piles first, then whole runs that turn a
+# face down card over, then anything else, and otherwise keeps to the usual
+# order.
+
+class Greedy(Policy):
+    name = "greedy"
+
+    def choose(self, game, moves):
+        best = None
+        best_rank = 3
+        for move in moves:
+            rank = self.rank(game, move)
+            if rank < best_rank:
+                best = move
+                best_rank = rank
+                if rank == 0: break
+        return best
+
+    # rank : Solitaire Move -> int
+    def rank(self, game, move):
+        if move.kind == COL_TO_ACCUM or move.kind == DRAW_TO_ACCUM:
+            return 0
+        if move.kind == COL_TO_COL and move.row > 1:
+            cards = len(game.columns[move.src]) - move.row
+            if game.faceup[move.src] <= cards: return 1
+        return 2
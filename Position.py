@@ -0,0 +1,146 @@
+# Position.py - Immutable, hashable board positions that share structure
+
+from Board import Board, NUM_CARDS, STACK_DOWN, STACK_UP
+from Moves import (iter_moves, DRAW_TO_COL, DRAW_TO_ACCUM, COL_TO_ACCUM,
+                   COL_TO_COL, DRAW, DRAW_UNTIL)
+from Solver import DRAW_MOVE
+from StockIndex import StockIndex
+from array import array
+
+# A Position holds the same layout as a Board, card for card, but in tuples,
+# and never changes. Making a move returns a new Position that shares every
+# column and pile the move didn't touch with the old one, so a search can
+# keep as many positions alive as it likes for the price of the columns that
+# differ, and branch from any of them without copying or undoing anything.
+# Positions compare and hash by their cards, so they can go straight into
+# sets and dicts.
+
+# columns: Seven tuples, each starting with the EMPTY sentinel
+# faceup: How many cards are face up in each column (same rules as Solitaire)
+# stock: The face down deck; the last element is drawn first
+# draw: Face up draw cards; the last element is the top card
+# stacks: Four accumulation piles, each starting with the EMPTY sentinel
+
+# replace : tuple int value -> tuple
+# Returns a copy of a tuple with one item swapped out
+def replace(items, i, value):
+    return items[:i] + (value,) + items[i + 1:]
+
+class Position(object):
+    __slots__ = ("columns", "faceup", "stock", "draw", "stacks", "hashed")
+
+    # __init__ : columns faceup stock draw stacks -> void
+    # Takes tuples laid out like a Board's arrays
+    def __init__(self, columns, faceup, stock, draw, stacks):
+        self.columns = columns
+        self.faceup = faceup
+        self.stock = stock
+        self.draw = draw
+        self.stacks = stacks
+        self.hashed = None
+
+    # from_board : Board -> Position
+    @classmethod
+    def from_board(cls, board):
+        return cls(tuple(tuple(col) for col in board.columns),
+                   tuple(board.faceup), tuple(board.stock), tuple(board.draw),
+                   tuple(tuple(stack) for stack in board.stacks))
+
+    # from_solitaire : Solitaire -> Position
+    @classmethod
+    def from_solitaire(cls, game):
+        return cls.from_board(Board.from_solitaire(game))
+
+    # to_board : Board
+    # Returns a Board with this position's cards, for the Solver or Solitaire
+    def to_board(self):
+        return Board([array('b', col) for col in self.columns],
+                     array('b', self.faceup), array('b', self.stock),
+                     array('b', self.draw),
+                     [array('b', stack) for stack in self.stacks])
+
+    # apply : Move -> Position
+    # Returns the position a legal move leads to. Only the columns and piles
+    # the move touches are copied.
+    def apply(self, move):
+        kind = move.kind
+        columns = self.columns
+        faceup = self.faceup
+        stacks = self.stacks
+        if kind == DRAW:
+            stock = self.stock
+            if stock:
+                count = min(3, len(stock))
+                return Position(columns, faceup, stock[:-count],
+                                self.draw + stock[:-count - 1:-1], stacks)
+            # turn the draw pile over into the stock
+            return Position(columns, faceup, self.draw[::-1], (), stacks)
+        if kind == DRAW_UNTIL:
+            position = self
+            for draw in range(move.row):
+                position = position.apply(DRAW_MOVE)
+            return position
+
+        stock = self.stock
+        draw = self.draw
+        if kind == DRAW_TO_COL or kind == DRAW_TO_ACCUM:
+            moving = draw[-1:]
+            draw = draw[:-1]
+        elif kind == COL_TO_COL or kind == COL_TO_ACCUM:
+            cards = columns[move.src]
+            moving = cards[move.row:]
+            columns = replace(columns, move.src, cards[:move.row])
+            faceup = replace(faceup, move.src,
+                             max(1, faceup[move.src] - len(moving)))
+        else:
+            pile = stacks[move.src]
+            moving = pile[-1:]
+            stacks = replace(stacks, move.src, pile[:-1])
+
+        if kind == DRAW_TO_ACCUM or kind == COL_TO_ACCUM:
+            stacks = replace(stacks, move.dst, stacks[move.dst] + moving)
+        else:
+            columns = replace(columns, move.dst, columns[move.dst] + moving)
+            faceup = replace(faceup, move.dst, faceup[move.dst] + len(moving))
+        return Position(columns, faceup, stock, draw, stacks)
+
+    # successors : bool bool -> generator
+    # Yields (Move, Position) for every legal move, in iter_moves order
+    def successors(self, from_accum=False, from_stock=False):
+        for move in iter_moves(self, from_accum, from_stock):
+            yield move, self.apply(move)
+
+    # talon_index : StockIndex
+    def talon_index(self):
+        return StockIndex(self.draw, self.stock)
+
+    # can_stack_up : card card -> bool
+    def can_stack_up(self, c1, c2):
+        return STACK_UP[c1 * NUM_CARDS + c2] == 1
+
+    # can_stack_down : card card -> bool
+    def can_stack_down(self, c1, c2):
+        return STACK_DOWN[c1 * NUM_CARDS + c2] == 1
+
+    # is_won : bool
+    def is_won(self):
+        for stack in self.stacks:
+            if len(stack) != 14: return False
+        return True
+
+    def __eq__(self, other):
+        return (isinstance(other, Position) and
+                self.columns == other.columns and
+                self.faceup == other.faceup and
+                self.stock == other.stock and
+                self.draw == other.draw and
+                self.stacks == other.stacks)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        if self.hashed is None:
+            self.hashed = hash((self.columns, self.faceup, self.stock,
+                                self.draw, self.stacks))
+        return self.hashed
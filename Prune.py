@@ -0,0 +1,108 @@
+# Prune.py - Canonical moves, dominated moves and safe moves to the piles
+
+from Board import CARD_INDEX, RANK, RED, SUIT
+from Moves import COL_TO_ACCUM, COL_TO_COL, DRAW_TO_ACCUM
+
+# Many of the moves a position allows make no difference to how the game
+# can go. The four accumulation piles are interchangeable, so an ace can go
+# on any empty one and only the first is worth trying; the same goes for a
+# king and the empty columns. A run that starts at the top of its column
+# gains nothing by moving to an empty column. And a card that is safe to
+# send to the accumulation piles (see is_safe) should just go, since nothing
+# else from that position can do better. These functions take a Solitaire,
+# a Board or a Position. The Solver builds its moves with the same rules
+# (first_empty, to_empty_column and is_safe), so the two can't drift apart.
+
+# card_int : card -> int
+# Returns a card in Board's integer form, whether it's an int or a string
+def card_int(card):
+    if isinstance(card, str): return CARD_INDEX[card]
+    return card
+
+# pile_heights : [stack] -> [int]
+# Returns how many cards of each suit are on the accumulation piles
+def pile_heights(stacks):
+    heights = [0, 0, 0, 0]
+    for stack in stacks:
+        if len(stack) > 1:
+            heights[SUIT[card_int(stack[1])]] = len(stack) - 1
+    return heights
+
+# is_safe : int [int] -> bool
+# Returns whether sending a card to the accumulation piles can't cost the
+# game: aces and twos always, otherwise once both lower cards it could hold
+# in a column are on the piles, and the other suit of its colour is close
+# behind. Takes pile_heights of the piles.
+def is_safe(card, heights):
+    rank = RANK[card]
+    if rank <= 1: return True
+    for suit in range(4):
+        if suit == SUIT[card]: continue
+        if RED[suit * 13] != RED[card]:
+            if heights[suit] < rank: return False
+        elif heights[suit] < rank - 1:
+            return False
+    return True
+
+# first_empty : [pile] -> int
+# Returns the index of the first empty column or accumulation pile (one
+# holding just its sentinel), or -1 if none is empty. It's the only empty
+# one worth moving to.
+def first_empty(piles):
+    for i in range(len(piles)):
+        if len(piles[i]) == 1: return i
+    return -1
+
+# to_empty_column : int int int -> bool
+# Returns whether moving cards from row (None for a single card off the
+# draw pile or an accumulation pile) to the empty column dest is worth
+# trying, given the first empty column: no other empty column is, and
+# neither is moving a whole column
+def to_empty_column(row, dest, empty):
+    return dest == empty and row != 1
+
+# moving_card : game Move -> int
+# Returns the card a move to the accumulation piles sends there
+def moving_card(game, move):
+    if move.kind == DRAW_TO_ACCUM:
+        return card_int(game.draw[-1])
+    return card_int(game.columns[move.src][-1])
+
+# safe_move : game [Move] -> Move
+# Returns the first move in a list that sends a safe card to the
+# accumulation piles, or None
+def safe_move(game, moves):
+    heights = None
+    for move in moves:
+        if move.kind != COL_TO_ACCUM and move.kind != DRAW_TO_ACCUM: continue
+        if heights is None: heights = pile_heights(game.stacks)
+        if is_safe(moving_card(game, move), heights): return move
+    return None
+
+# canonical : game [Move] -> [Move]
+# Drops moves to any empty pile or empty column but the first, and moves of
+# a whole column into an empty one
+def canonical(game, moves):
+    columns = game.columns
+    stacks = game.stacks
+    empty_column = first_empty(columns)
+    empty_pile = first_empty(stacks)
+    kept = []
+    for move in moves:
+        kind = move.kind
+        if kind == COL_TO_ACCUM or kind == DRAW_TO_ACCUM:
+            if len(stacks[move.dst]) == 1 and move.dst != empty_pile:
+                continue
+        elif move.dst is not None and len(columns[move.dst]) == 1:
+            row = move.row if kind == COL_TO_COL else None
+            if not to_empty_column(row, move.dst, empty_column): continue
+        kept.append(move)
+    return kept
+
+# prune : game [Move] -> [Move]
+# Returns just the first safe move to the accumulation piles if there is
+# one, or else the canonical moves
+def prune(game, moves):
+    move = safe_move(game, moves)
+    if move is not None: return [move]
+    return canonical(game, moves)
@@ -0,0 +1,167 @@
+# Renderer.py - Terminal renderers for the Solitaire board
+
+from timeit import default_timer
+import sys
+
+# A frame is a list of screen lines, and each line is a list of cells. A cell
+# is (text, width): the text may hold colour codes, the width is what it
+# takes up on screen. Every frame has its cells in the same places, so two
+# frames can be compared cell by cell.
+
+BLUE = '\033[44m'
+RESET = '\033[0m'
+
+# card_text : card -> string
+# Returns a card wrapped in the colour codes for its suit
+def card_text(c):
+    if c[1] == "D":
+        return '\033[37;41m' + c + RESET
+    elif c[1] == "H":
+        return '\033[32;41m' + c + RESET
+    elif c[1] == "S":
+        return '\033[36;40m' + c + RESET
+    elif c[1] == "C":
+        return '\033[33;40m' + c + RESET
+    return ""
+
+# build_frame : Solitaire -> frame
+# Lays the board out in traditional Klondike style
+def build_frame(game):
+    # Top row: Draw cards and accumulation piles
+    if len(game.deck.cards) > 0:
+        top = [(BLUE + "[.]" + RESET + " ", 4)] # cards remain
+    else:
+        top = [(BLUE + "[ ]" + RESET + " ", 4)] # deck is empty
+
+    # Up to three drawn cards
+    for i in range(-3, 0):
+        if len(game.draw) >= (i * -1): # the *last three* of the array
+            top.append((card_text(game.draw[i]) + " ", 3))
+        else:
+            top.append(("   ", 3))
+    top.append(("  ", 2))
+
+    # Accumulation piles, showing only the top card
+    for stack in game.stacks:
+        if len(stack) > 1:
+            top.append((card_text(stack[-1]) + " ", 3))
+        else:
+            top.append(("__ ", 3))
+
+    # Number the columns for ease of reference
+    numbers = [(" ", 1)] + [(str(num) + "   ", 4) for num in range(1, 8)]
+
+    frame = [[], [("          DC   A1 A2 A3 A4", 26)], [("          \/", 12)],
+             top, [], numbers, []]
+
+    # Find the largest column of working cards for array bounds
+    max_length = max(len(x) for x in game.columns)
+
+    # Each column of cards, one row at a time
+    for row in range(1, (max_length + 1)):
+        line = []
+        for col in range(7):
+            cards = game.columns[col]
+            if len(cards) > row:
+                # If the card is uncovered, show its identity
+                if (len(cards) - row) <= game.faceup[col]:
+                    line.append((card_text(cards[row]) + "  ", 4))
+                else:
+                    line.append((BLUE + "[]" + RESET + "  ", 4))
+            else:
+                line.append(("    ", 4))
+        line.append(("     " + str(row), 5 + len(str(row)))) # number each row
+        frame.append(line)
+    frame.append([])
+    frame.append([])
+    return frame
+
+# frame_text : frame -> string
+def frame_text(frame):
+    return "\n".join("".join(text for text, width in line) for line in frame)
+
+# A Renderer draws every frame in full, with a single write to out (or to
+# whatever sys.stdout is at the time).
+
+class Renderer(object):
+
+    def __init__(self, out=None):
+        self.out = out
+
+    # write : string -> void
+    def write(self, text):
+        out = self.out or sys.stdout
+        out.write(text)
+        out.flush()
+
+    # render : Solitaire bool -> void
+    def render(self, game, force=False):
+        self.write(frame_text(build_frame(game)))
+
+    # finish : Solitaire -> void
+    # Makes sure the last state of the game is on screen
+    def finish(self, game):
+        pass
+
+# A NullRenderer draws nothing.
+
+class NullRenderer(Renderer):
+
+    def __init__(self):
+        pass
+
+    def render(self, game, force=False):
+        pass
+
+# A DiffRenderer clears the screen once, then only redraws the cells that
+# changed since the last frame it drew. Frames that come sooner than
+# 1 / max_fps seconds after the last one are skipped (unless forced);
+# finish draws the game if its latest frame was skipped. Each write leaves
+# the cursor under the board so messages print below it.
+
+class DiffRenderer(Renderer):
+
+    def __init__(self, out=None, max_fps=30):
+        Renderer.__init__(self, out)
+        self.interval = 1.0 / max_fps if max_fps else 0
+        self.last = None # cell (y, x) -> (text, width) on screen
+        self.drawn_at = None
+        self.pending = False
+
+    def render(self, game, force=False):
+        now = default_timer()
+        if (not force and self.drawn_at is not None and
+                now - self.drawn_at < self.interval):
+            self.pending = True
+            return
+        self.drawn_at = now
+        self.pending = False
+
+        frame = build_frame(game)
+        cells = {}
+        for y, line in enumerate(frame):
+            x = 0
+            for cell in line:
+                cells[(y, x)] = cell
+                x += cell[1]
+
+        if self.last is None:
+            out = ["\033[2J\033[H", frame_text(frame)]
+        else:
+            out = []
+            last = self.last
+            for key, cell in cells.items():
+                if last.get(key) != cell:
+                    out.append("\033[%d;%dH%s" % (key[0] + 1, key[1] + 1,
+                                                  cell[0]))
+            for key, cell in last.items():
+                if key not in cells: # blank out cells that went away
+                    out.append("\033[%d;%dH%s" % (key[0] + 1, key[1] + 1,
+                                                  " " * cell[1]))
+            out.append("\033[%d;1H" % (len(frame) + 1))
+        self.last = cells
+        self.write("".join(out))
+
+    def finish(self, game):
+        if self.pending:
+            self.render(game, True)
@@ -0,0 +1,26 @@
+# Results.py - Result codes and events the Solitaire engine reports
+
+from Solver import WON, LOST, UNKNOWN
+
+# Solitaire never prints. Every command returns one of these codes, and
+# whatever happens along the way that a front end might want to show is
+# reported to the game's listener as an event. Front ends decide what to say
+# (see Console.py); library callers just compare codes.
+
+# Result codes
+OK = "ok"
+BAD_COORDINATE = "bad coordinate" # not a coordinate on the board
+FACE_DOWN = "face down"           # the source card isn't turned over yet
+NO_DRAW_CARD = "no draw card"     # the draw pile is empty
+BAD_DESTINATION = "bad destination" # not a column's end or a pile
+NO_SUCH_MOVE = "no such move"     # nothing moves from there to there
+ILLEGAL = "illegal"               # the card can't go there
+GAME_OVER = "game over"           # no more moves; nothing was drawn
+WINNABLE = "winnable"             # the game can be solved; nothing was drawn
+NOTHING_TO_UNDO = "nothing to undo"
+NOTHING_TO_REDO = "nothing to redo"
+# solve returns WON, LOST or UNKNOWN, and auto_run WON or GAME_OVER
+
+# Events, passed to listener(event, game)
+BECAME_WINNABLE = "became winnable" # every card is face up and dealt out
+AUTO_MOVED = "auto moved"           # auto_run made a move
@@ -0,0 +1,187 @@
+# Simulator.py - Headless batch autoplay and solving across worker processes
+
+from Solitaire import Solitaire
+from SolvedDeals import SolvedDeals, DEFAULT_CAPACITY
+from Stats import Stats, from_solve
+from Solver import Solver, WON, LOST, UNKNOWN
+from Trace import Trace
+from collections import namedtuple
+from functools import partial
+from multiprocessing import Pool
+import Moves
+import math
+import time
+import traceback
+
+# A GameResult is streamed back for every simulated game.
+
+# deal: Microsoft-style deal number of the game
+# won: Whether autoplay finished the game
+# moves: Card moves made
+# draws: Draws from the stock (turning the stock over doesn't count)
+# passes: Times the stock was turned over
+# elapsed: Wall-clock seconds spent on the game
+# error: None, or the traceback of an exception that ended the game
+# trace: The game's Trace as text, if it was asked for, or None
+# reason: Why the deal was rejected as lost without playing it (a reason code
+#  from Deadlock.py), or None if it was played
+
+GameResult = namedtuple("GameResult",
+                        "deal won moves draws passes elapsed error trace "
+                        "reason")
+
+# play_game : int Policy bool -> GameResult
+# Plays one deal with autoplay, following the given Policy if there is one,
+# and recording the game's trace if record is True. A deal that Deadlock.py
+# proves lost isn't played at all. Exceptions are caught and reported so
+# that one bad game can't take down a batch.
+def play_game(deal, policy=None, record=False):
+    start = time.time()
+    sol = None
+    reason = None
+    try:
+        sol = Solitaire(deal=deal, policy=policy)
+        reason = sol.deadlock()
+        won = reason is None and sol.play_auto() == WON
+        error = None
+    except Exception:
+        won = False
+        error = traceback.format_exc()
+    moves = draws = passes = 0
+    trace = None
+    if sol is not None:
+        for entry in sol.journal.done:
+            if entry.move.kind != Moves.DRAW:
+                moves += 1
+            elif entry.count > 0:
+                draws += 1
+            else:
+                passes += 1
+        if record:
+            trace = Trace.record(sol).to_text()
+    return GameResult(deal, won, moves, draws, passes, time.time() - start,
+                      error, trace, reason)
+
+# run_batch : int int int int Policy bool -> generator
+# Plays deals first to first + games - 1 across a pool of worker processes,
+# yielding each GameResult as soon as it finishes (not in deal order). A
+# single worker plays in this process without a pool. Results are the same
+# for a given deal no matter how the batch is split up.
+def run_batch(games, workers=None, first=1, chunksize=16, policy=None,
+              record=False):
+    return run_pool(partial(play_game, policy=policy, record=record),
+                    xrange(first, first + games), workers, chunksize)
+
+# play_match : (int, Policy, int) -> (int, GameResult)
+# Plays one deal of a tournament, tagging the result with the policy's place
+# in the list of policies
+def play_match(task):
+    index, policy, deal = task
+    return index, play_game(deal, policy)
+
+# run_tournament : [Policy] int int int int -> generator
+# Plays deals first to first + games - 1 with every policy, all in one pool
+# of worker processes, yielding (policy index, GameResult) as each finishes
+def run_tournament(policies, games, workers=None, first=1, chunksize=4):
+    tasks = [(index, policy, deal)
+             for deal in xrange(first, first + games)
+             for index, policy in enumerate(policies)]
+    return run_pool(play_match, tasks, workers, chunksize)
+
+# wilson : int int float -> (float, float)
+# Returns the Wilson score interval for a win rate (95% with the default z)
+def wilson(wins, games, z=1.96):
+    if games == 0: return (0.0, 1.0)
+    rate = float(wins) / games
+    middle = rate + z * z / (2 * games)
+    spread = z * math.sqrt(rate * (1 - rate) / games +
+                           z * z / (4 * games * games))
+    scale = 1 + z * z / games
+    return ((middle - spread) / scale, (middle + spread) / scale)
+
+# run_pool : function [task] int int -> generator
+# Maps a function over tasks in a pool of worker processes, yielding results
+# as they finish. A single worker runs the tasks in this process.
+def run_pool(function, tasks, workers=None, chunksize=16):
+    if workers == 1:
+        for task in tasks:
+            yield function(task)
+        return
+
+    pool = Pool(workers)
+    try:
+        for result in pool.imap_unordered(function, tasks, chunksize):
+            yield result
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+# The solved deal file each solving worker writes to, and its Stats
+# database if there is one
+solved_deals = None
+stats = None
+
+# open_solved_deals : path path -> void
+# Maps the results file, and opens the statistics database, once per worker
+# process
+def open_solved_deals(path, stats_path=None):
+    global solved_deals, stats
+    solved_deals = SolvedDeals(path)
+    if stats_path is not None:
+        stats = Stats(stats_path)
+
+# solve_chunk : (int, int, int, number) -> (int, int, int, int)
+# Solves deals first to first + count - 1, writes all of their results to
+# the worker's solved deal file in one go (and to its statistics in one
+# transaction), and returns how many were won, lost and left unknown, and
+# how many were skipped for not fitting in the file
+def solve_chunk(task):
+    first, count, max_nodes, max_time = task
+    results = []
+    skipped = 0
+    for deal in xrange(first, first + count):
+        if not 0 <= deal < solved_deals.capacity:
+            skipped += 1
+            continue
+        result = Solver(max_nodes, max_time).solve(Solitaire(deal=deal))
+        results.append((deal, result))
+    solved_deals.store_many(results)
+    if stats is not None:
+        stats.record_many([from_solve(deal, result)
+                           for deal, result in results])
+        stats.flush()
+    statuses = [result.status for deal, result in results]
+    return (statuses.count(WON), statuses.count(LOST),
+            statuses.count(UNKNOWN), skipped)
+
+# solve_batch : path int int int int number int path int -> generator
+# Solves deals first to first + games - 1 across a pool of worker processes
+# and records the results in the solved deal file at path, and in the Stats
+# database at stats_path if one is given. The file is created with room for
+# capacity deals, and grown first if the batch goes past its end. Yields a
+# (won, lost, unknown, skipped) tally for each chunk of deals as it
+# finishes; skipped deals are ones the file can't hold (negative numbers).
+def solve_batch(path, games, workers=None, first=1, max_nodes=200000,
+                max_time=None, chunk=16, stats_path=None,
+                capacity=DEFAULT_CAPACITY):
+    # create or grow the file before the workers map it
+    solved = SolvedDeals(path, max(capacity, first + games))
+    solved.grow(first + games)
+    solved.close()
+    if stats_path is not None:
+        Stats(stats_path).close() # and the database, so they don't race
+    tasks = [(start, min(chunk, first + games - start), max_nodes, max_time)
+             for start in xrange(first, first + games, chunk)]
+    pool = Pool(workers, open_solved_deals, (path, stats_path))
+    try:
+        for tally in pool.imap_unordered(solve_chunk, tasks):
+            yield tally
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
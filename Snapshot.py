@@ -0,0 +1,169 @@
+# Snapshot.py - Fixed-size binary snapshots of a game, for saving and IPC
+
+from array import array
+from Board import Board, CARD_INDEX, CARD_NAMES, EMPTY
+from Deck import Deck
+from Journal import Journal
+from Moves import Move, legal_moves
+from Solitaire import Solitaire
+from Zobrist import position_hash
+import struct
+
+# Every snapshot is SIZE bytes, little-endian:
+
+# magic, version: "PYKS" and VERSION
+# flags: Bit 0 is winnable_is_known
+# deal: The Microsoft-style deal number, or 0 for a shuffled deck
+# position: The game's position hash (loading works it out again instead)
+# journal: How many moves and draws the journal holds (the journal head)
+# pass_hints, pass_positions: The stock pass counters, capped at 65535
+# hint: The hint Move's kind, src, row and dst (NONE for None), or all NONE
+# lengths: Cards in each column, not counting the sentinel
+# faceup: Each column's face up count, as Solitaire keeps it
+# waste, stock: Cards in the draw pile and in the stock
+# piles: The top card of each accumulation pile, or EMPTY
+# cards: The columns from bottom to top, then the draw pile from bottom to
+#  top, then the stock from bottom to top (the last is drawn next). Cards on
+#  the accumulation piles follow from the top cards, so the rest is EMPTY.
+
+# Loading checks that the snapshot describes a real layout: every card is
+# one of the 52 and appears exactly once, counting the cards implied by the
+# piles, and each face up count is between 1 and one more than the column's
+# length (Solitaire keeps counting an emptied column's sentinel). The hint
+# has to be one of the legal moves from the loaded layout, and the position
+# hash is worked out from the layout rather than trusted. Anything else
+# raises ValueError, so a corrupt or hostile snapshot can't build an
+# impossible game.
+
+# Undo history isn't saved: a loaded game can't undo past the snapshot, and
+# has no Trace. Its seen positions start over from the loaded position, so
+# later hints can differ from the saved game's once it has made lateral moves.
+
+MAGIC = "PYKS"
+VERSION = 1
+NONE = 0xff
+LAYOUT = struct.Struct("<4sBBIQIHH4B7B7BBB4B52B")
+SIZE = LAYOUT.size
+
+# pack : Solitaire -> string
+def pack(game):
+    buf = bytearray(SIZE)
+    pack_into(game, buf)
+    return str(buf)
+
+# pack_into : Solitaire buffer int -> void
+# Writes a snapshot into a writable buffer (a bytearray or an mmap, say)
+def pack_into(game, buf, offset=0):
+    cards = []
+    lengths = []
+    for col in game.columns:
+        lengths.append(len(col) - 1)
+        cards.extend(CARD_INDEX[card] for card in col[1:])
+    cards.extend(CARD_INDEX[card] for card in game.draw)
+    cards.extend(CARD_INDEX[card] for card in game.deck.cards)
+    cards.extend([EMPTY] * (52 - len(cards)))
+    piles = [CARD_INDEX[stack[-1]] for stack in game.stacks]
+    move = game.hint_move
+    if move is None:
+        hint = [NONE] * 4
+    else:
+        hint = [NONE if field is None else field
+                for field in (move.kind, move.src, move.row, move.dst)]
+    LAYOUT.pack_into(buf, offset, MAGIC, VERSION,
+                     1 if game.winnable_is_known else 0,
+                     game.deck.deal or 0, game.position, len(game.journal),
+                     min(game.pass_hints, 0xffff),
+                     min(game.pass_positions, 0xffff),
+                     *(hint + lengths + list(game.faceup) +
+                       [len(game.draw), len(game.deck.cards)] +
+                       piles + cards))
+
+# unpack_fields : buffer int -> tuple
+# Reads the fields of a snapshot straight out of any buffer (a string,
+# bytearray, memoryview or mmap) without copying it first
+def unpack_fields(buf, offset=0):
+    try:
+        fields = LAYOUT.unpack_from(buf, offset)
+    except struct.error as error:
+        raise ValueError("not a snapshot: " + str(error))
+    if fields[0] != MAGIC or fields[1] != VERSION:
+        raise ValueError("not a version %d snapshot" % VERSION)
+    return fields
+
+# unpack_board : buffer int -> Board
+# Reads just the card layout of a snapshot
+def unpack_board(buf, offset=0):
+    return board_from_fields(unpack_fields(buf, offset))
+
+# board_from_fields : tuple -> Board
+# Raises ValueError if the fields don't describe a real layout
+def board_from_fields(fields):
+    lengths = fields[12:19]
+    faceup = fields[19:26]
+    waste, stock = fields[26:28]
+    piles = fields[28:32]
+    cards = fields[32:]
+    check_layout(lengths, faceup, waste, stock, piles, cards)
+
+    columns = []
+    i = 0
+    for length in lengths:
+        columns.append(array('b', (EMPTY,) + cards[i:i + length]))
+        i += length
+    draw = array('b', cards[i:i + waste])
+    i += waste
+    stock = array('b', cards[i:i + stock])
+    stacks = []
+    for top in piles:
+        stack = array('b', [EMPTY])
+        if top != EMPTY:
+            stack.extend(range(top - top % 13, top + 1))
+        stacks.append(stack)
+    return Board(columns, array('b', faceup), stock, draw, stacks)
+
+# check_layout : [int] [int] int int [int] [int] -> void
+# Raises ValueError unless the sections hold each of the 52 cards once
+def check_layout(lengths, faceup, waste, stock, piles, cards):
+    for length, count in zip(lengths, faceup):
+        if not 1 <= count <= length + 1:
+            raise ValueError("bad face up count in snapshot")
+    used = sum(lengths) + waste + stock
+    if used > 52:
+        raise ValueError("too many cards in snapshot")
+    for card in cards[used:]:
+        if card != EMPTY:
+            raise ValueError("card past the end of the snapshot's layout")
+    seen = list(cards[:used])
+    for top in piles:
+        if top == EMPTY: continue
+        if top >= 52:
+            raise ValueError("bad pile card in snapshot")
+        seen.extend(range(top - top % 13, top + 1))
+    if len(seen) != 52 or sorted(seen) != range(52):
+        raise ValueError("snapshot doesn't hold each card exactly once")
+
+# unpack : buffer int -> Solitaire
+# Loads a game from a snapshot. Keyword arguments go to Solitaire, so the
+# game can be given an instrument or a policy.
+def unpack(buf, offset=0, **kwargs):
+    fields = unpack_fields(buf, offset)
+    game = Solitaire(deck=Deck(cards=CARD_NAMES[:52]), **kwargs)
+    board_from_fields(fields).restore(game)
+    game.deck.deal = fields[3] or None
+    game.deck.order = None # the deal's order isn't saved
+    game.winnable_is_known = bool(fields[2] & 1)
+    game.position = position_hash(Board.from_solitaire(game))
+    game.seen = set([game.position])
+    game.stock_index = None
+    game.journal = Journal()
+    game.pass_hints, game.pass_positions = fields[6:8]
+    if fields[8] == NONE:
+        game.hint_move = None
+    else:
+        hint = tuple(None if field == NONE else field
+                     for field in fields[8:12])
+        if hint not in [(move.kind, move.src, move.row, move.dst)
+                        for move in legal_moves(game)]:
+            raise ValueError("snapshot's hint isn't a legal move")
+        game.hint_move = Move(*hint)
+    return game
@@ -3,10 +3,25 @@
 # 5/22/15
 
 from Deck import Deck
-import sys
-import copy
-
-# The Solitaire class holds several structures to track card positions
+from Instrument import timed
+from Board import Board, CARD_INDEX, NUM_CARDS, STACK_DOWN, STACK_UP
+from Deadlock import find_deadlock
+from Journal import Journal, Entry
+from Moves import Move
+from Solver import Solver
+from Results import (OK, BAD_COORDINATE, FACE_DOWN, NO_DRAW_CARD,
+                     BAD_DESTINATION, NO_SUCH_MOVE, ILLEGAL, GAME_OVER,
+                     WINNABLE, NOTHING_TO_UNDO, NOTHING_TO_REDO, WON,
+                     BECAME_WINNABLE, AUTO_MOVED)
+from Zobrist import KEYS, PILES, FACEUP, FACEDOWN, STOCK, FOUNDATION
+from Zobrist import position_hash
+from StockIndex import StockIndex
+import Moves
+import Prune
+
+# The Solitaire class holds several structures to track card positions. It
+# is the game engine alone: it never prints or reads input, and every command
+# returns a result code from Results.py. Console.py is the terminal front end.
 
 # deck: An object containing an array of cards
 # columns: A list of lists, modeling each column of the game board
@@ -14,364 +29,425 @@ import copy
 #  face up
 # draw: A list tracking all cards that are face up in the draw pile.
 # stacks: A list of lists tracking cards in the accumulation piles.
-# hint: Either the empty list or a source and a destination
-# moves: An accumulating list of bools that tracks whether or not there is
-#  a legal move on each draw of the deck. If all False when the deck is emptied,
-#  the game is over.
-
-# lateral_list: Every move from column to column should be productive; the same
-#  move cannot happen twice and move the player closer towards a solution.
-#  therefore, any time a lateral move is suggested, or a lateral move is made,
-#  the move is added to a dictionary.
+# hint_move: The Move the hint search suggests, or None (hint_coords gives
+#  it as a source and a destination)
+# pass_hints: How many hint searches found a move during the current pass
+#  through the stock
+# pass_positions: How many new positions were reached during the current pass.
+#  If both are 0 when the deck is emptied, the game is over.
+
+# position: A Zobrist hash of the cards' places, not counting which of the
+#  stock and draw pile holds them, kept up to date on every move.
+# seen: Every move from column to column should be productive; it should never
+#  take the board back to where it has already been. Positions are remembered
+#  until a card leaves the stock or a face down card is turned over, since no
+#  earlier position can come back after that. A lateral move to a position in
+#  this set is never suggested.
+
+# stock_index: A StockIndex of the stock and draw pile, or None until it's
+#  needed again after a card leaves the draw pile
+
+# journal: Every move and draw, recorded so it can be undone and redone
+# instrument: An Instrument recording counters and timings, or None
+# policy: A Policy that picks among the moves the hint search finds (a
+#  HintEngine, say), or None to suggest the first one
+# listener: Called as listener(event, game) with the events in Results.py, or
+#  None
 
 class Solitaire:
 
-    # __init__ : void
-    # Initializes all member variables and sets the game board
-    def __init__(self):
-        self.deck = Deck() # grab a shuffled deck of cards
+    # __init__ : seed deal Deck -> void
+    # Initializes all member variables and sets the game board. The deal is
+    # random unless a seed, a Microsoft-style deal number or a Deck is given.
+    def __init__(self, seed=None, deal=None, deck=None, instrument=None,
+                 policy=None, listener=None):
+        if deck is None:
+            deck = Deck(seed, deal) # grab a shuffled deck of cards
+        self.deck = deck
         self.columns = [["ZZ"], ["ZZ"], ["ZZ"], ["ZZ"], 
                 ["ZZ"], ["ZZ"], ["ZZ"]] # empty sentinel
         self.faceup = [1, 1, 1, 1, 1, 1, 1] # beginning configuration
         self.draw = [] # To begin, no cards are face up
         self.stacks = [["ZZ"], ["ZZ"], ["ZZ"], ["ZZ"]] # empty stacks
-        self.hint = [] # No hint to start
-        self.moves = [] # list of bools telling if the draw holds valid moves
-        self.lateral_list = {}
-        self.prev = copy.deepcopy(self)
-        self.can_undo = False
+        self.hint_move = None # No hint to start
+        self.pass_hints = 0 # counters for the current pass through the stock
+        self.pass_positions = 0
+        self.journal = Journal()
         self.winnable_is_known = False
+        self.instrument = None
+        if instrument is not None: instrument.attach(self)
+        self.policy = policy
+        self.listener = listener
 
         # Deal a new game
         for i in range(7):
             for j in range (i + 1):
                 self.columns[i].append(self.deck.draw())
-
-    # printboard : void
-    # Prints board layout in traditional Klondike style
-    def printboard(self):
-        # Top row: Draw cards and accumulation piles
-        sys.stdout.write("\n")
-        print "          DC   A1 A2 A3 A4"
-        print "          \/"
-        if len(self.deck.cards) > 0:
-            sys.stdout.write('\033[44m' + "[.]" + '\033[0m') # cards remain
-        else:
-            sys.stdout.write('\033[44m' + "[ ]" + '\033[0m') # deck is empty
-        sys.stdout.write(" ")
-
-        # Print up to three drawn cards
-        for i in range(-3, 0):
-            if len(self.draw) >= (i * -1): # To print *last three* of the array
-                self.print_card(self.draw[i])
-            else: 
-                sys.stdout.write("  ")
-            sys.stdout.write(" ")
-        sys.stdout.write("  ")
-
-        # Print accumulation piles
-        for stack in self.stacks:
-            if len(stack) > 1:
-                self.print_card(stack[-1]) # show only the top card
-            else:
-                sys.stdout.write("__")
-            sys.stdout.write(" ")
-        sys.stdout.write("\n\n")
-
-        # Number the columns for ease of reference
-        sys.stdout.write(" ")
-        for num in range(1, 8):
-            sys.stdout.write(str(num))
-            sys.stdout.write("   ")
-        sys.stdout.write("\n\n")
-
-        # Find the largest column of working cards for array bounds
-        max_length = max(len(x) for x in self.columns)
-
-        # Print each column of cards one row at a time
-        for row in range(1, (max_length + 1)):
-            for col in range(7):
-                if len(self.columns[col]) > row:
-                    # If the card is uncovered, print its identity
-                    if (len(self.columns[col]) - (row)) <= self.faceup[col]:
-                        self.print_card(self.columns[col][row])
-                    else:
-                        sys.stdout.write('\033[44m' + "[]" + '\033[0m')
-
-                    sys.stdout.write("  ")
-                else:
-                    sys.stdout.write("    ")
-            sys.stdout.write("     " + str(row)) # number each row
-            sys.stdout.write("\n")
-        sys.stdout.write("\n")
-
-    # print_card : card -> void
-    # Prints card with color depending on suit
-    def print_card(self, c):
-        if c[1] == "D":
-            sys.stdout.write('\033[37;41m' + c + '\033[0m')
-        elif c[1] == "H":
-            sys.stdout.write('\033[32;41m' + c + '\033[0m')
-        elif c[1] == "S":
-            sys.stdout.write('\033[36;40m' + c + '\033[0m')
-        elif c[1] == "C":
-            sys.stdout.write('\033[33;40m' + c + '\033[0m')
+        self.position = position_hash(Board.from_solitaire(self))
+        self.seen = set([self.position])
+        self.stock_index = None
+
+    # deal_number : int
+    # Returns the rank of this game's deal, which Deck.from_rank turns back
+    # into the same deal. A game loaded from a Snapshot only knows it if it
+    # was dealt by number; otherwise this raises ValueError.
+    def deal_number(self):
+        return self.deck.rank()
+
+    # deadlock : string
+    # Returns why the game can never be won from here (a reason code from
+    # Deadlock.py), or None if that isn't plain from the layout
+    def deadlock(self):
+        return find_deadlock(Board.from_solitaire(self))
+
+    # is_known_winnable : SolvedDeals -> bool
+    # Looks this game's deal up among previously solved deals; returns None
+    # if it was never solved (or wasn't dealt from a deal number)
+    def is_known_winnable(self, solved_deals):
+        if self.deck.deal is None: return None
+        try:
+            return solved_deals.is_winnable(self.deck.deal)
+        except IndexError:
+            return None
 
     # can_stack_up : card card -> bool
     # Returns whether c1 can be placed on top of c2 in an accumulation pile
     def can_stack_up(self, c1, c2):
-        ranks = "A23456789TJQK"
-        order = c2[0] + c1[0] # e.g. "28", "JQ", "43"
-
-        if c2[0] == "Z" and c1[0] == "A": 
-            return True # base case
-
-        # Check for sequential order and same suit
-        else:
-            return c1[1] == c2[1] and order in ranks
+        return STACK_UP[CARD_INDEX[c1] * NUM_CARDS + CARD_INDEX[c2]] == 1
 
     # can_stack_down : card card -> bool
     # Returns whether a card can be added to the bottom of a column
     def can_stack_down(self, c1, c2):
-        ranks = "A23456789TJQK"
-        order = c1[0] + c2[0] # e.g. "28", "JQ", "43"
-
-        if c2[0] == "Z" and c1[0] == "K": 
-            return True # base case
-
-        # Check order and suit
-        return ((c1[1] == "S" and (c2[1] == "D" or c2[1] == "H") or
-                 c1[1] == "C" and (c2[1] == "D" or c2[1] == "H") or
-                 c1[1] == "D" and (c2[1] == "S" or c2[1] == "C") or
-                 c1[1] == "H" and (c2[1] == "S" or c2[1] == "C")) and 
-                order in ranks)
-
-    # draw_cards : bool
-    # Draw cards from deck and hold face up as long as there are cards left
-    # returns True if the move is successful, False if the game is over
+        return STACK_DOWN[CARD_INDEX[c1] * NUM_CARDS + CARD_INDEX[c2]] == 1
+
+    # draw_cards : code
+    # Draws cards from the deck and holds them face up. Once the deck is
+    # empty, the draw pile is turned over to make a new one, unless the game
+    # is over (GAME_OVER) or can be solved (WINNABLE).
     def draw_cards(self):
         # if deck is empty, the face-up stack becomes the deck again
-        length = len(self.deck.cards)
-        if length == 0:
+        if len(self.deck.cards) == 0:
             if self.is_over():
-                print "There are no more moves. Thanks for playing!"
-                return False
+                return GAME_OVER
             elif self.is_winnable():
-                print "The game is winnable! Nice going! Type 's' to solve."
-                return True
-            else:
-                self.moves = []
-                self.deck.cards = list(reversed(self.draw)) # turn over the deck!
-                self.draw = []
-                self.hint = []
-                self.check_possible_moves()
-                return True
+                return WINNABLE
+        self.draw_from_stock()
+        return OK
+
+    # draw_from_stock : bool -> void
+    # Draws up to three cards, or turns the draw pile over into an empty
+    # deck, without checking whether the game is over. Pass check=False to
+    # skip the hint search when the draw is known to turn up nothing new.
+    @timed("draw")
+    def draw_from_stock(self, check=True):
+        length = len(self.deck.cards)
+        if length == 0:
+            self.backup(Move(Moves.DRAW, None, None, None), 0)
+            if self.instrument is not None:
+                self.instrument.count("stock_recycles")
+            self.pass_hints = 0
+            self.pass_positions = 0
+            self.deck.cards = list(reversed(self.draw)) # turn over the deck!
+            self.draw = []
+            self.hint_move = None
+            if check: self.check_possible_moves()
+            return
+
+        # Draw up to three new cards, depending on how many are left
+        if length >= 3:
+            cards_to_draw = 3
         else:
-            # Draw up to three new cards, depending on how many are left
-            if length >= 3:
-                cards_to_draw = 3
-            else:
-                cards_to_draw = length
+            cards_to_draw = length
+        self.backup(Move(Moves.DRAW, None, None, None), cards_to_draw)
+        if self.instrument is not None:
+            self.instrument.count("draws")
         for card in range(cards_to_draw):
             self.draw.append(self.deck.draw())
 
         # Detect if new board state has valid moves; update hint
-        self.check_possible_moves()
-        return True
-
-    # parse_move : move move bool -> bool
-    # Parses user input, and if legal, moves card(s) from m1 to m2
-    # Argue with True to execute moves, argue with False to return move validity
-    def parse_move(self, m1, m2, to_be_run):
+        if check: self.check_possible_moves()
+
+    # move : move move -> code
+    # Makes the move from coordinate m1 to coordinate m2, if it's legal
+    def move(self, m1, m2):
+        result, move = self.parse_move(m1, m2)
+        if result != OK: return result
+        return self.apply_move(move)
+
+    # parse_move : move move -> (code, Move)
+    # Parses a source and a destination coordinate, such as "32" and "A3".
+    # Returns OK and the Move they describe if it can be made, or the reason
+    # it can't and None. Nothing on the board changes.
+    @timed("parse")
+    def parse_move(self, m1, m2):
+        if len(m1) < 2 or len(m2) < 2:
+            return BAD_COORDINATE, None
 
         # Parse source
         if m1[0] in "1234567":
+            c1_col = int(m1[0]) - 1
             try:
-                c1_col = int(m1[0]) - 1
                 c1_row = int(m1[1:]) # Take rest of string to grab double digits
-                c1 = self.columns[c1_col][c1_row]
-            except IndexError:
-                if to_be_run: print "That's not a valid coordinate. Try again."
-                return False
             except ValueError:
-                if to_be_run: print "That's not a valid coordinate. Try again."
-                return False
+                return BAD_COORDINATE, None
+            if not 1 <= c1_row < len(self.columns[c1_col]):
+                return BAD_COORDINATE, None
             if (len(self.columns[c1_col]) - c1_row) > self.faceup[c1_col]:
-                if to_be_run: print "That card isn't uncovered yet. Try again."
-                return False
+                return FACE_DOWN, None
             source = "col"
 
         elif m1 == "DC":
             if len(self.draw) == 0:
-                if to_be_run: print ("There are no draw cards available." + 
-                               " Try again.")
-                return False
-            c1 = self.draw[-1]
+                return NO_DRAW_CARD, None
             source = "draw"
 
         elif m1[0] == "A":
-            try:
-                if int(m1[1:]) < 1 or int(m1[1:]) > 4:
-                    if to_be_run: print ("That's not a valid coordinate." + 
-                                         "Try again.")
-                    return False
-            except ValueError:
-                if to_be_run: print ("That's not a valid coordinate." + 
-                                     " Try again.")
-                return False
-            c1 = self.stacks[int(m1[1]) - 1][-1]
+            if m1[1:] not in ("1", "2", "3", "4"):
+                return BAD_COORDINATE, None
             c1_stack = int(m1[1]) - 1
             source = "accum"
         else:
-            if to_be_run: print "That's not a valid coordinate. Try again."
-            return False
+            return BAD_COORDINATE, None
 
         # Parse destination
         if m2[0] in "1234567":
+            c2_col = int(m2[0]) - 1
             try:
-                c2_col = int(m2[0]) - 1
                 c2_row = int(m2[1:]) - 1
-                c2 = self.columns[c2_col][c2_row]
-            except IndexError:
-                if to_be_run: print "That's not a valid coordinate. Try again."
-                return False
             except ValueError:
-                if to_be_run: print "That's not a valid coordinate. Try again."
-                return False
-            if (len(self.columns[c2_col]) - c2_row) > self.faceup[c2_col]:
-                if to_be_run: print "That's not a valid coordinate. Try again."
-                return False
+                return BAD_COORDINATE, None
             # Ensure destination is the bottom of the stack
             if c2_row != len(self.columns[c2_col]) - 1:
-                if to_be_run: print "That's not a valid coordinate. Try again."
-                return False
+                return BAD_DESTINATION, None
             dest = "col"
 
         elif m2[0] == "A":
-            if int(m2[1:]) < 1 or int(m2[1:]) > 4:
-                if to_be_run: print "That's not a valid coordinate. Try again."
-                return False
-            c2 = self.stacks[int(m2[1]) - 1][-1]
+            if m2[1:] not in ("1", "2", "3", "4"):
+                return BAD_COORDINATE, None
             c2_stack = int(m2[1]) - 1
             dest = "accum"
         else:
-            if to_be_run: print "Your destination isn't valid. Try again."
-            return False
+            return BAD_DESTINATION, None
 
         # Deal with each possible movement case
 
         if source == "col" and dest == "col":
-            result = self.move_col_to_col(c1, c2, m1, m2, c1_col, c1_row, 
-                                        c2_col, c2_row, to_be_run)
+            move = Move(Moves.COL_TO_COL, c1_col, c1_row, c2_col)
         elif source == "col" and dest == "accum":
-            result = self.move_col_to_accum(c1, c2, c1_col, c2_stack, to_be_run)
+            move = Move(Moves.COL_TO_ACCUM, c1_col, c1_row, c2_stack)
         elif source == "draw" and dest == "col":
-            result = self.move_draw_to_col(c1, c2, c2_col, to_be_run)
+            move = Move(Moves.DRAW_TO_COL, None, None, c2_col)
         elif source == "draw" and dest == "accum":
-            result = self.move_draw_to_accum(c1, c2, c2_stack, to_be_run)
+            move = Move(Moves.DRAW_TO_ACCUM, None, None, c2_stack)
         elif source == "accum" and dest == "col":
-            result = self.move_accum_to_col(c1, c2, c1_stack, c2_col, to_be_run)
+            move = Move(Moves.ACCUM_TO_COL, c1_stack, None, c2_col)
         else:
-            print "You can't move from there to there. Try again."
-            return False
-
-        if self.is_winnable() and not self.winnable_is_known:
-            if to_be_run: print "The game is winnable! Nice going!"
-            self.winnable_is_known = True
+            return NO_SUCH_MOVE, None
+
+        if not self.is_legal(move):
+            return ILLEGAL, None
+        return OK, move
+
+    # is_legal : Move -> bool
+    # Returns whether a card can go where a move puts it. Draws always can.
+    def is_legal(self, move):
+        kind = move.kind
+        if kind == Moves.COL_TO_COL:
+            return self.can_stack_down(self.columns[move.src][move.row],
+                                       self.columns[move.dst][-1])
+        elif kind == Moves.COL_TO_ACCUM:
+            cards = self.columns[move.src]
+            return (move.row == len(cards) - 1 and
+                    self.can_stack_up(cards[-1], self.stacks[move.dst][-1]))
+        elif kind == Moves.DRAW_TO_COL:
+            return self.can_stack_down(self.draw[-1],
+                                       self.columns[move.dst][-1])
+        elif kind == Moves.DRAW_TO_ACCUM:
+            return self.can_stack_up(self.draw[-1], self.stacks[move.dst][-1])
+        elif kind == Moves.ACCUM_TO_COL:
+            return self.can_stack_down(self.stacks[move.src][-1],
+                                       self.columns[move.dst][-1])
+        return True
 
+    # apply_move : Move -> code
+    # Executes a move from the move generator without re-parsing coordinates
+    @timed("move")
+    def apply_move(self, move):
+        kind = move.kind
+        if kind == Moves.DRAW:
+            self.draw_from_stock()
+            return OK
+        elif kind == Moves.DRAW_UNTIL:
+            for draw in range(move.row - 1):
+                self.draw_from_stock(False)
+            self.draw_from_stock()
+            return OK
+        elif kind == Moves.COL_TO_COL:
+            result = self.move_col_to_col(move.src, move.row, move.dst)
+        elif kind == Moves.COL_TO_ACCUM:
+            result = self.move_col_to_accum(move.src, move.dst)
+        elif kind == Moves.DRAW_TO_COL:
+            result = self.move_draw_to_col(move.dst)
+        elif kind == Moves.DRAW_TO_ACCUM:
+            result = self.move_draw_to_accum(move.dst)
+        else:
+            result = self.move_accum_to_col(move.src, move.dst)
+        self.check_winnable()
         return result
 
-    # move_col_to_col : card card move move pos pos pos bool -> bool
-    # If legal, moves c1 to c2
-    def move_col_to_col(self, c1, c2, m1, m2, c1_col, c1_row, 
-                        c2_col, c2_row, to_be_run):
-        if self.can_stack_down(c1, c2):
-            if not to_be_run: return True
-            self.backup()
-
-            # Add this move, and its reverse, to the lateral move list
-            move = m1 + " " + m2
-            rev  = m2 + " " + m1
-            self.lateral_list[move] = 1
-            self.lateral_list[rev]  = 1
-
-            # Find how many cards will be moved
-            num_cards = len(self.columns[c1_col]) - c1_row
-            moving = []
-            # Shuffle them from one stack to the other
-            for card in range(num_cards):
-                moving.append(self.columns[c1_col].pop())
-                self.faceup[c1_col] -= 1
-                if self.faceup[c1_col] == 0: self.faceup[c1_col] = 1
-            for card in range(num_cards):
-                self.columns[c2_col].append(moving.pop())
-                self.faceup[c2_col] += 1
-            self.check_possible_moves()
-            return True
-        else:
-            if to_be_run: print "That card can't go there. Try again."
-            return False
-
-    # move_col_to_accum : card card pos pos bool -> bool
-    # If legal, moves c1 to c2
-    def move_col_to_accum(self, c1, c2, c1_col, c2_stack, to_be_run):
-        if self.can_stack_up(c1, c2):
-            if not to_be_run: return True
-            self.backup()
-            moving = self.columns[c1_col].pop()
-            self.stacks[c2_stack].append(moving)
+    # check_winnable : void
+    # Reports (once) that the game has become winnable
+    def check_winnable(self):
+        if self.is_winnable() and not self.winnable_is_known:
+            self.winnable_is_known = True
+            if self.listener is not None:
+                self.listener(BECAME_WINNABLE, self)
+
+    # move_col_to_col : pos pos pos -> code
+    # If legal, moves the cards from row c1_row of column c1_col onto the end
+    # of column c2_col
+    def move_col_to_col(self, c1_col, c1_row, c2_col):
+        if not self.can_stack_down(self.columns[c1_col][c1_row],
+                                   self.columns[c2_col][-1]):
+            return ILLEGAL
+
+        # Find how many cards will be moved
+        num_cards = len(self.columns[c1_col]) - c1_row
+        entry = self.backup(Move(Moves.COL_TO_COL, c1_col, c1_row, c2_col),
+                            num_cards)
+        old_faceup = self.faceup[c1_col]
+
+        moving = []
+        # Shuffle them from one stack to the other
+        for card in range(num_cards):
+            moving.append(self.columns[c1_col].pop())
             self.faceup[c1_col] -= 1
             if self.faceup[c1_col] == 0: self.faceup[c1_col] = 1
-            self.check_possible_moves()
-            return True
-        else:
-            if to_be_run: print "That card can't go there. Try again."
-            return False
-
-    # move_draw_to_col : card card pos bool -> bool
-    # If legal, moves c1 to c2
-    def move_draw_to_col(self, c1, c2, c2_col, to_be_run):
-        if self.can_stack_down(c1, c2):
-            if not to_be_run: return True
-            self.backup()
-            moving = self.draw.pop()
-            self.columns[c2_col].append(moving)
-            self.faceup[c2_col] += 1
-            self.check_possible_moves()
-            return True
-        else:
-            if to_be_run: print "That card can't go there. Try again."
-            return False
-
-    # move_draw_to_accum : card card pos bool -> bool
-    # If legal, moves c1 to c2
-    def move_draw_to_accum(self, c1, c2, c2_stack, to_be_run):
-        if self.can_stack_up(c1, c2):
-            if not to_be_run: return True
-            self.backup()
-            moving = self.draw.pop()
-            self.stacks[c2_stack].append(moving)
-            self.check_possible_moves()
-            return True
-        else:
-            if to_be_run: print "That card can't go there. Try again."
-            return False
-
-    # move_accum_to_col : card card pos pos bool -> bool
-    # If legal, moves c1 to c2
-    def move_accum_to_col(self, c1, c2, c1_stack, c2_col, to_be_run):
-        if self.can_stack_down(c1, c2):
-            if not to_be_run: return True
-            self.backup()
-            moving = self.stacks[c1_stack].pop()
-            self.columns[c2_col].append(moving)
+        delta = 0
+        for card in range(num_cards):
+            card = moving.pop()
+            delta ^= (self.card_key(card, FACEUP + c1_col) ^
+                      self.card_key(card, FACEUP + c2_col))
+            self.columns[c2_col].append(card)
             self.faceup[c2_col] += 1
-            self.check_possible_moves()
-            return True
-        else:
-            if to_be_run: print "That card can't go there. Try again."
-            return False
- 
+        flip = self.flip_key(c1_col, old_faceup, num_cards)
+        self.advance(entry, delta ^ flip, flip != 0)
+        self.check_possible_moves()
+        return OK
+
+    # move_col_to_accum : pos pos -> code
+    # If legal, moves the last card of column c1_col to pile c2_stack
+    def move_col_to_accum(self, c1_col, c2_stack):
+        if not self.can_stack_up(self.columns[c1_col][-1],
+                                 self.stacks[c2_stack][-1]):
+            return ILLEGAL
+        entry = self.backup(Move(Moves.COL_TO_ACCUM, c1_col,
+                                 len(self.columns[c1_col]) - 1,
+                                 c2_stack), 1)
+        old_faceup = self.faceup[c1_col]
+        moving = self.columns[c1_col].pop()
+        self.stacks[c2_stack].append(moving)
+        self.faceup[c1_col] -= 1
+        if self.faceup[c1_col] == 0: self.faceup[c1_col] = 1
+        flip = self.flip_key(c1_col, old_faceup, 1)
+        self.advance(entry, (self.card_key(moving, FACEUP + c1_col) ^
+                             self.card_key(moving, FOUNDATION) ^ flip),
+                     flip != 0)
+        self.check_possible_moves()
+        return OK
+
+    # move_draw_to_col : pos -> code
+    # If legal, moves the draw card to the end of column c2_col
+    def move_draw_to_col(self, c2_col):
+        if not self.can_stack_down(self.draw[-1], self.columns[c2_col][-1]):
+            return ILLEGAL
+        entry = self.backup(Move(Moves.DRAW_TO_COL, None, None, c2_col), 1)
+        moving = self.draw.pop()
+        self.stock_index = None
+        self.columns[c2_col].append(moving)
+        self.faceup[c2_col] += 1
+        self.advance(entry, (self.card_key(moving, STOCK) ^
+                             self.card_key(moving, FACEUP + c2_col)), True)
+        self.check_possible_moves()
+        return OK
+
+    # move_draw_to_accum : pos -> code
+    # If legal, moves the draw card to pile c2_stack
+    def move_draw_to_accum(self, c2_stack):
+        if not self.can_stack_up(self.draw[-1], self.stacks[c2_stack][-1]):
+            return ILLEGAL
+        entry = self.backup(Move(Moves.DRAW_TO_ACCUM, None, None, c2_stack),
+                            1)
+        moving = self.draw.pop()
+        self.stock_index = None
+        self.stacks[c2_stack].append(moving)
+        self.advance(entry, (self.card_key(moving, STOCK) ^
+                             self.card_key(moving, FOUNDATION)), True)
+        self.check_possible_moves()
+        return OK
+
+    # move_accum_to_col : pos pos -> code
+    # If legal, moves the top card of pile c1_stack to the end of column c2_col
+    def move_accum_to_col(self, c1_stack, c2_col):
+        if not self.can_stack_down(self.stacks[c1_stack][-1],
+                                   self.columns[c2_col][-1]):
+            return ILLEGAL
+        entry = self.backup(Move(Moves.ACCUM_TO_COL, c1_stack, None, c2_col),
+                            1)
+        moving = self.stacks[c1_stack].pop()
+        self.columns[c2_col].append(moving)
+        self.faceup[c2_col] += 1
+        self.advance(entry, (self.card_key(moving, FOUNDATION) ^
+                             self.card_key(moving, FACEUP + c2_col)),
+                     False)
+        self.check_possible_moves()
+        return OK
+
+    # card_key : card int -> int
+    # Returns the Zobrist key for a card lying in the given pile
+    def card_key(self, card, pile):
+        return KEYS[CARD_INDEX[card] * PILES + pile]
+
+    # flip_key : int int int -> int
+    # After count cards came off a column that had old_faceup cards face up,
+    # returns the hash change from turning over the card underneath, or 0 if
+    # no card was turned over
+    def flip_key(self, col, old_faceup, count):
+        cards = self.columns[col]
+        if old_faceup - count > 0 or len(cards) == 1: return 0
+        return (self.card_key(cards[-1], FACEDOWN + col) ^
+                self.card_key(cards[-1], FACEUP + col))
+
+    # advance : Entry int bool -> void
+    # Moves the position hash on by delta and remembers the new position.
+    # An irreversible move forgets every earlier position.
+    def advance(self, entry, delta, irreversible):
+        entry.position = self.position
+        self.position ^= delta
+        if irreversible:
+            entry.seen = self.seen
+            self.seen = set([self.position])
+            self.pass_positions += 1
+        elif self.position not in self.seen:
+            self.seen.add(self.position)
+            entry.added = True
+            self.pass_positions += 1
+
+    # lateral_position : Move -> int
+    # Returns the position a column to column move would lead to, or None if
+    # it turns over a card (and so can't lead anywhere already seen)
+    def lateral_position(self, move):
+        cards = self.columns[move.src]
+        count = len(cards) - move.row
+        if self.faceup[move.src] - count <= 0 and move.row > 1: return None
+        h = self.position
+        src = FACEUP + move.src
+        dst = FACEUP + move.dst
+        for row in range(move.row, len(cards)):
+            index = CARD_INDEX[cards[row]] * PILES
+            h ^= KEYS[index + src] ^ KEYS[index + dst]
+        return h
+
     # is_won : bool
     # Return whether or not the game is completely finished
     def is_won(self):
@@ -381,68 +457,54 @@ class Solitaire:
 
     # check_possible_moves : void
     # Update move possibility list for current game state
+    @timed("hint")
     def check_possible_moves(self):
-
-        # Try moving the draw card to every position
-        for col in range(1, 8):
-            row = str(len(self.columns[col - 1]))
-            dest = str(col) + row
-            source = "DC"
-            if self.parse_move(source, dest, False):
-                self.update_hint([source, dest])
-                return
-
-        # Try moving the draw card to every stack
-        for stack in range(1, 5):
-                source = "DC"
-                dest = "A" + str(stack)
-                if self.parse_move(source, dest, False):
-                    self.update_hint([source, dest])
-                    return
-
-        # Try moving every top card to every stack
-        for col in range(1, 8):
-            source = str(col) + str(len(self.columns[col - 1]) - 1)
-            for stack in range(1, 5):
-                dest = "A" + str(stack)
-                if self.parse_move(source, dest, False):
-                    self.update_hint([source, dest])
-                    return
-
-        # Try moving every column to every other column
-        # These are lateral movements and should be checked last
-        for col in range(1, 8):
-            for row in range(1,20):
-                for destcol in range(1, 8):
-                    source = str(col) + str(row)
-                    dest = (str(destcol) + 
-                            str(len(self.columns[destcol - 1])))
-                    if source[0] == dest[0]: continue # Ignore same column moves
-                    if self.parse_move(source, dest, False):
-                        # ensure the move is unique before adding it
-                        move = source + " " + dest
-                        # Don't bother with moving K-anchored stacks col->col
-                        if not (source[1:] == "1" and dest[1:] == "1"):
-                            if not self.lateral_list.has_key(move):
-                                self.update_hint([source, dest])
-                                return
+        examined = 0
+        found = None
+        candidates = []
+        for move in Moves.iter_moves(self):
+            examined += 1
+            # Lateral movements are only suggested once, and never for
+            # K-anchored stacks moving into an empty column
+            if move.kind == Moves.COL_TO_COL:
+                if move.row == 1 and len(self.columns[move.dst]) == 1:
+                    continue
+                if self.lateral_position(move) in self.seen:
+                    continue
+            candidates.append(move)
+            if self.policy is None: break # the first move will do
+        if self.policy is not None:
+            found = self.policy.choose(self, Prune.prune(self, candidates))
+        elif candidates:
+            found = candidates[0]
+        if self.instrument is not None:
+            self.instrument.hint_search(examined)
+        if found is not None:
+            self.update_hint(found)
+            return
 
         # No new move/hint was found
-        self.hint = []
-        self.moves.append(False)
+        self.hint_move = None
+
+    # update_hint : Move -> void
+    # Overwrites hint and counts a playable state in this pass
+    def update_hint(self, move):
+        self.hint_move = move
+        self.pass_hints += 1
 
-    # update_hint : hint -> void
-    # Overwrites hint and adds a True (playable) state to the move list
-    def update_hint(self, newhint):
-        self.hint = newhint
-        self.moves.append(True)
+    # hint_coords : [move, move]
+    # Returns the current hint as a source and a destination coordinate, or
+    # the empty list if there isn't one
+    def hint_coords(self):
+        if self.hint_move is None: return []
+        return self.hint_move.coords(self)
 
     # is_over : bool
-    # Check to see if there were no possible moves for every deck state
+    # Check to see if a whole pass through the stock went by without a
+    # possible move or a new position
     def is_over(self):
-        if not self.is_winnable():
-            return all(x == False for x in self.moves)
-        return False
+        if self.deck.cards != [] or self.is_winnable(): return False
+        return self.pass_hints == 0 and self.pass_positions == 0
 
     # is_winnable : bool
     # Checks if game is winnable (deck is empty and no cards are left unturned)
@@ -454,128 +516,141 @@ class Solitaire:
             if self.faceup[x] < (len(self.columns[x]) - 1): return False
         return True
 
-    # solve : bool
-    # Automatically finishes a winnable game
-    def solve(self):
+    # solve : int number -> code
+    # Automatically finishes a winnable game. Until every card is uncovered,
+    # this searches for a win from the current position, within the given
+    # node and time limits. Returns WON, or LOST or UNKNOWN with the game
+    # left as it was.
+    @timed("solve", profile=True)
+    def solve(self, max_nodes=1000000, max_time=30):
         if self.is_winnable():
             while not self.is_won():
                 self.check_possible_moves()
-                self.parse_move(self.hint[0], self.hint[1], True)
-            self.printboard()
-            print "You've won! Thanks for playing!"
-            return True
+                self.apply_move(self.hint_move)
         else:
-            print "Sorry, the game isn't solvable yet!"
-            return False
-
-    # auto_run : bool
-    # Automatically plays the game while possible
+            result = Solver(max_nodes, max_time).solve(self)
+            if result.status != WON:
+                return result.status
+            for move in result.moves:
+                self.apply_move(move)
+        return WON
+
+    # auto_run : code
+    # Automatically plays the game while possible, returning WON or GAME_OVER
+    @timed("auto_run", profile=True)
     def auto_run(self):
         while not self.is_won() or self.is_over():
             self.check_possible_moves()
-            while self.hint == []:
+            while self.hint_move is None:
+                self.skip_draws()
                 self.draw_cards()
                 if self.is_over():
-                    print "Automated play ended in failure."
-                    return False
-            self.parse_move(self.hint[0], self.hint[1], True)
-            self.printboard()
-        if self.is_won():
-            self.printboard()
-            print "Automated play ended in success!"
-            return True
-
-    # show_hint : void
-    # Prints most recent possible move to screen
-    def show_hint(self):
-        if len(self.hint) == 0: 
-            print "No hint available! Try drawing more cards."
-        else: sys.stdout.write("Hint: " + self.hint[0] + " --> " + 
-                               self.hint[1] + "\n")
-
-    # undo : void
-    # Replaces object data with that of the previous game state
+                    return GAME_OVER
+            self.apply_move(self.hint_move)
+            if self.listener is not None:
+                self.listener(AUTO_MOVED, self)
+        return WON
+
+    # talon_index : StockIndex
+    # Returns the index of the stock and draw pile, building it if need be
+    def talon_index(self):
+        if self.stock_index is None:
+            self.stock_index = StockIndex(self.draw, self.deck.cards)
+        return self.stock_index
+
+    # skip_draws : void
+    # With no hint to follow, makes all but the last of the draws it takes to
+    # bring up a playable card, or to reach the end of the stock, without
+    # searching for hints in between (there can't be any)
+    def skip_draws(self):
+        tops = [col[-1] for col in self.columns]
+        draws = self.talon_index().draws_until(
+            len(self.draw), lambda card: Moves.is_playable(self, card, tops))
+        left = (len(self.deck.cards) + 2) // 3 # draws left in this pass
+        if draws is None or draws > left: draws = left
+        for draw in range(draws - 1):
+            self.draw_from_stock(False)
+
+    # undo : code
+    # Steps back one move or draw; can be repeated back to the deal
+    @timed("undo")
     def undo(self):
-        if not self.can_undo:
-            print "Sorry, you can only undo the most recent move."
-            return
-        self.deck = self.prev.deck
-        self.columns = self.prev.columns
-        self.faceup = self.prev.faceup
-        self.draw = self.prev.draw
-        self.stacks = self.prev.stacks
-        self.hint = self.prev.hint
-        self.move = self.prev.moves
-        self.lateral_list = self.prev.lateral_list
-        print "Undid previous move."
-        self.can_undo = False
-
-    # backup : void
-    # Backs up current game state for undo feature
-    def backup(self):
-        self.prev = copy.deepcopy(self)
-        self.can_undo = True
-
-    # get_input : input -> bool
-    # Parses user input and executes command
-    def get_input(self, move):
-        if (len(move) != 2) or (len(move[0]) < 2) or (len(move[1]) < 2):
-            print "That's not a valid move. Try again."
-            return False
+        if not self.journal.can_undo():
+            return NOTHING_TO_UNDO
+        self.revert(self.journal.undo())
+        return OK
+
+    # redo : code
+    # Makes the most recently undone move or draw again
+    @timed("undo")
+    def redo(self):
+        if not self.journal.can_redo():
+            return NOTHING_TO_REDO
+        self.apply_move(self.journal.redo().move)
+        return OK
+
+    # backup : Move int -> Entry
+    # Records a journal entry for a move that is about to be made
+    def backup(self, move, count):
+        entry = Entry(move, count)
+        kind = move.kind
+        if kind == Moves.COL_TO_COL or kind == Moves.COL_TO_ACCUM:
+            entry.src_faceup = self.faceup[move.src]
+        if (kind == Moves.COL_TO_COL or kind == Moves.DRAW_TO_COL or
+                kind == Moves.ACCUM_TO_COL):
+            entry.dst_faceup = self.faceup[move.dst]
+        entry.hint_move = self.hint_move
+        entry.pass_hints = self.pass_hints
+        entry.pass_positions = self.pass_positions
+        entry.winnable_is_known = self.winnable_is_known
+        self.journal.record(entry)
+        if self.instrument is not None:
+            self.instrument.count("journal_entries")
+        return entry
+
+    # revert : Entry -> void
+    # Reverses the move or draw recorded in a journal entry
+    def revert(self, entry):
+        move = entry.move
+        kind = move.kind
+        if kind == Moves.COL_TO_COL:
+            dest = self.columns[move.dst]
+            self.columns[move.src].extend(dest[-entry.count:])
+            del dest[-entry.count:]
+        elif kind == Moves.COL_TO_ACCUM:
+            self.columns[move.src].append(self.stacks[move.dst].pop())
+        elif kind == Moves.DRAW_TO_COL:
+            self.draw.append(self.columns[move.dst].pop())
+            self.stock_index = None
+        elif kind == Moves.DRAW_TO_ACCUM:
+            self.draw.append(self.stacks[move.dst].pop())
+            self.stock_index = None
+        elif kind == Moves.ACCUM_TO_COL:
+            self.stacks[move.src].append(self.columns[move.dst].pop())
+        if kind != Moves.DRAW: # draws don't change the position
+            if entry.seen is not None:
+                self.seen = entry.seen
+            elif entry.added:
+                self.seen.discard(self.position)
+            self.position = entry.position
+        elif entry.count == 0: # the stock was turned over
+            self.draw = list(reversed(self.deck.cards))
+            self.deck.cards = []
         else:
-            self.parse_move(move[0].upper(), move[1].upper(), True)
-
-    def print_intro(self):
-        print ("\n\n\nWelcome to Solitaire!\n" + 
-               "To move cards, enter two coordinates: a source and a destination.\n" +
-               "A coordinate is either two numbers without a space, or a letter code.\n" +
-               "For the letter codes shown below, case does not matter.\n" + 
-               "Columns are addressed first with numbers 1-7,\n" + 
-               "then rows are addressed with numbers 1-19.\n" 
-               + "Accumulation piles are addressed as A1, A2, A3 and A4.\n" +
-               "To draw new cards from the deck, type D.\n" + 
-               "To access the top card of the draw pile, address as DC.\n" + 
-               'Some example moves: "11 22", "DC 54", "32 A3", "719 111".\n' + 
-               'You can undo your previous move by typing "undo".\n' + 
-               'Type "hint" or "h" to see a possible move, which is helpful when stuck.\n'
-               + 'Type "help" if you want to see this again or "q" to quit. Have fun!\n\n')
-
+            for card in range(entry.count):
+                self.deck.cards.append(self.draw.pop())
+
+        if entry.src_faceup is not None:
+            self.faceup[move.src] = entry.src_faceup
+        if entry.dst_faceup is not None:
+            self.faceup[move.dst] = entry.dst_faceup
+        self.hint_move = entry.hint_move
+        self.pass_hints = entry.pass_hints
+        self.pass_positions = entry.pass_positions
+        self.winnable_is_known = entry.winnable_is_known
+
+    # play_auto : code
+    # Plays a fresh game with autoplay, returning WON or GAME_OVER
     def play_auto(self):
         self.check_possible_moves()
         return self.auto_run()
-
-    # play : bool
-    # Input loop to play game, returns whether or not the game was won
-    def play(self):
-        self.print_intro()
-
-        # Generate initial hint
-        self.check_possible_moves()
-
-        while True:
-            self.printboard()
-            ans = raw_input("Enter a move: ")
-            if ans in ["Q", "q", "quit", "exit"]: 
-                exit(1)
-            elif ans in ["d", "D", "draw", "Draw", "DRAW"]: 
-                if not self.draw_cards():
-                    return False
-            elif ans in ["hint", "Hint", "HINT", "h", "H"]:
-                self.show_hint()
-            elif ans in ["u", "undo", "UNDO", "Undo"]:
-                self.undo()
-            elif ans in ["s", "solve", "S", "SOLVE"]:
-                if self.solve():
-                    return True
-            elif ans in ["autoplay"]:
-                return self.auto_run()
-            elif ans in ["help", "Help", "HELP"]:
-                self.print_intro()
-            else:
-                self.get_input(ans.split())
-                if self.is_won():
-                    self.printboard()
-                    print "You've won! Thanks for playing!"
-                    return True
-        print "Thanks for playing!"
-        return
\ No newline at end of file
@@ -0,0 +1,102 @@
+# SolvedDeals.py - Memory-mapped file of solver results, keyed by deal number
+
+from Solver import WON, LOST, UNKNOWN
+import mmap
+import os
+import struct
+
+# The file is a 16-byte header followed by one fixed-size record per deal
+# number, from 0 up to the capacity given when the file was created. Unused
+# records stay zero, so a new file is sparse on disk.
+
+# Header: magic, capacity
+# Record: status, solution length, nodes searched
+
+MAGIC = "PYKLDEAL"
+HEADER = struct.Struct("<8sQ")
+RECORD = struct.Struct("<BxHI")
+DEFAULT_CAPACITY = 1 << 20
+
+# Status bytes; 0 means the deal hasn't been solved
+STATUS_CODES = {WON: 1, LOST: 2, UNKNOWN: 3}
+STATUSES = {1: WON, 2: LOST, 3: UNKNOWN}
+
+# A SolvedDeals maps the whole file and reads and writes records in place.
+# Several processes can map the same file and write at once without a lock,
+# as long as each writes its own deals; records never straddle each other.
+
+class SolvedDeals(object):
+
+    # __init__ : path int -> void
+    # Opens a results file, creating it with room for deals 0 to
+    # capacity - 1 if it doesn't exist yet
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, capacity))
+                f.truncate(HEADER.size + capacity * RECORD.size)
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, self.capacity = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(path + " is not a solved deal file")
+
+    # offset : int -> int
+    # Returns where a deal's record starts
+    def offset(self, deal):
+        if not 0 <= deal < self.capacity:
+            raise IndexError("deal " + str(deal) + " is out of range")
+        return HEADER.size + deal * RECORD.size
+
+    # lookup : int -> (status, int, int) or None
+    # Returns a deal's status, solution length and node count, or None if
+    # it hasn't been solved
+    def lookup(self, deal):
+        code, length, nodes = RECORD.unpack_from(self.map, self.offset(deal))
+        if code == 0: return None
+        return (STATUSES[code], length, nodes)
+
+    # is_winnable : int -> bool or None
+    # Returns whether a deal can be won, or None if nobody knows yet
+    def is_winnable(self, deal):
+        code = ord(self.map[self.offset(deal)])
+        if code == 1: return True
+        if code == 2: return False
+        return None
+
+    # grow : int -> void
+    # Makes room for deals up to capacity - 1, if there isn't already. Other
+    # processes that have the file mapped keep seeing the old capacity, so
+    # grow it before handing it to them.
+    def grow(self, capacity):
+        if capacity <= self.capacity: return
+        self.map.close()
+        self.file.truncate(HEADER.size + capacity * RECORD.size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        HEADER.pack_into(self.map, 0, MAGIC, capacity)
+        self.capacity = capacity
+
+    # store : int SolveResult -> void
+    # Records the result of solving a deal
+    def store(self, deal, result):
+        RECORD.pack_into(self.map, self.offset(deal),
+                         STATUS_CODES[result.status],
+                         min(len(result.moves), 0xffff),
+                         min(result.nodes, 0xffffffff))
+
+    # store_many : [(int, SolveResult)] -> void
+    # Records a batch of results in deal order
+    def store_many(self, results):
+        for deal, result in sorted(results, key=lambda item: item[0]):
+            self.store(deal, result)
+
+    # flush : void
+    # Makes sure everything written so far is on disk
+    def flush(self):
+        self.map.flush()
+
+    # close : void
+    def close(self):
+        self.map.close()
+        self.file.close()
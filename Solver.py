@@ -0,0 +1,381 @@
+# Solver.py - Decides whether a deal can be won, and finds a way to win it
+
+from Board import Board, EMPTY, NUM_CARDS, RANK, STACK_DOWN
+from Deadlock import find_deadlock
+from Moves import (Move, DRAW_TO_COL, DRAW_TO_ACCUM, COL_TO_ACCUM,
+                   COL_TO_COL, ACCUM_TO_COL, DRAW, DRAW_UNTIL)
+from Prune import first_empty, is_safe, pile_heights, to_empty_column
+from Zobrist import (KEYS, PILES, FACEUP, FACEDOWN, STOCK, WASTE,
+                     FOUNDATION, board_hash)
+import time
+
+# Outcomes of a search
+WON = "won"         # a winning line was found
+LOST = "lost"       # every line was searched and none of them wins
+UNKNOWN = "unknown" # the node or time limit ran out first
+
+# A SolveResult describes one search.
+
+# status: WON, LOST or UNKNOWN
+# moves: The winning line as a list of Moves (DRAW_UNTIL moves draw until a
+#  card comes up), or [] when there isn't one
+# nodes: Positions the search generated
+# elapsed: Wall-clock seconds spent searching
+# reason: Why the position was lost without searching (a reason code from
+#  Deadlock.py), or None
+
+class SolveResult(object):
+    __slots__ = ("status", "moves", "nodes", "elapsed", "reason")
+
+    def __init__(self, status, moves, nodes, elapsed, reason=None):
+        self.status = status
+        self.moves = moves
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.reason = reason
+
+    def __repr__(self):
+        return "SolveResult(%s, %d moves, %d nodes, %.3fs)" % (
+            self.status, len(self.moves), self.nodes, self.elapsed)
+
+# A TranspositionTable remembers position hashes in a fixed number of slots.
+# Each hash has one slot; a new hash evicts whatever was there, so the table
+# never grows, and forgetting a position only costs searching it again.
+
+class TranspositionTable(object):
+    __slots__ = ("slots", "mask")
+
+    def __init__(self, bits=20):
+        self.slots = [0] * (1 << bits)
+        self.mask = (1 << bits) - 1
+
+    # seen : int -> bool
+    # Returns whether a hash is in the table, and stores it if not
+    def seen(self, h):
+        i = h & self.mask
+        if self.slots[i] == h:
+            return True
+        self.slots[i] = h
+        return False
+
+DRAW_MOVE = Move(DRAW, None, None, None)
+
+# A Solver runs a depth-first search over a Board, making and unmaking moves
+# in place and keeping the position's Zobrist hash up to date as it goes.
+# Positions already searched are skipped via the transposition table, so
+# cycling through the stock with nothing new to play ends a line.
+
+# max_nodes, max_time: Limits on one search (None means no time limit)
+# table_bits: The transposition table has 2 ** table_bits slots
+
+class Solver(object):
+
+    def __init__(self, max_nodes=1000000, max_time=None, table_bits=20):
+        self.max_nodes = max_nodes
+        self.max_time = max_time
+        self.table_bits = table_bits
+        self.board = None
+        self.hash = 0
+
+    # solve : game -> SolveResult
+    # Searches for a win from a Solitaire game or a Board. The game itself
+    # is left untouched. A position Deadlock.py proves lost isn't searched.
+    def solve(self, game):
+        start = time.time()
+        if isinstance(game, Board):
+            self.board = game.copy()
+        else:
+            self.board = Board.from_solitaire(game)
+        reason = find_deadlock(self.board)
+        if reason is not None:
+            return SolveResult(LOST, [], 0, time.time() - start, reason)
+        self.hash = board_hash(self.board)
+        table = TranspositionTable(self.table_bits)
+        table.seen(self.hash)
+        on_path = set([self.hash])
+        path = [] # (move, undo token, hash before the move)
+        frames = [self.candidates()]
+        nodes = 0
+        status = LOST
+
+        if self.is_won():
+            return SolveResult(WON, [], 0, time.time() - start)
+
+        while frames:
+            moves = frames[-1]
+            if not moves:
+                # Every move from here has been searched; back up one
+                frames.pop()
+                if path:
+                    move, token, old = path.pop()
+                    on_path.discard(self.hash)
+                    self.unplay(move, token)
+                    self.hash = old
+                continue
+
+            move = moves.pop()
+            old = self.hash
+            token = self.play(move)
+            nodes += 1
+            if self.hash in on_path or table.seen(self.hash):
+                self.unplay(move, token)
+                self.hash = old
+                continue
+
+            path.append((move, token, old))
+            if self.is_won():
+                status = WON
+                break
+            if nodes >= self.max_nodes:
+                status = UNKNOWN
+                break
+            if (self.max_time is not None and nodes & 1023 == 0 and
+                    time.time() - start > self.max_time):
+                status = UNKNOWN
+                break
+            on_path.add(self.hash)
+            frames.append(self.candidates())
+
+        solution = [entry[0] for entry in path] if status == WON else []
+        return SolveResult(status, solution, nodes, time.time() - start)
+
+    # is_won : bool
+    def is_won(self):
+        for stack in self.board.stacks:
+            if len(stack) != 14: return False
+        return True
+
+    # foundation_for : card -> int
+    # Returns the accumulation pile a card can go on, or -1
+    def foundation_for(self, card):
+        stacks = self.board.stacks
+        if RANK[card] == 0:
+            return first_empty(stacks)
+        for s in range(4):
+            if stacks[s][-1] == card - 1: return s
+        return -1
+
+    # candidates : [Move]
+    # Lists the moves to search from the current position, best last (the
+    # search pops from the end), pruned the way Prune.py describes: a safe
+    # move to the accumulation piles is searched on its own, and only the
+    # first empty pile and the first empty column are tried. Drawing only
+    # matters for the card it brings up, so instead of single draws there is
+    # one DRAW_UNTIL per playable card in the stock. Part of a run is only
+    # moved to free the card under it for the accumulation piles or the draw
+    # card, and a card only comes off the accumulation piles if some face up
+    # card could then go on it.
+    def candidates(self):
+        board = self.board
+        columns = board.columns
+        faceup = board.faceup
+        stacks = board.stacks
+        tops = [col[-1] for col in columns]
+        drawn = board.draw[-1] if board.draw else EMPTY
+        empty = first_empty(columns)
+        heights = pile_heights(stacks)
+
+        progress = [] # cards to the accumulation piles
+        uncover = []  # whole runs moved off face down cards
+        waste = []    # draw card to a column
+        lateral = []  # other column to column moves
+        back = []     # cards off the accumulation piles
+
+        for col in range(7):
+            cards = columns[col]
+            length = len(cards)
+            if length == 1: continue
+            s = self.foundation_for(tops[col])
+            if s >= 0:
+                move = Move(COL_TO_ACCUM, col, length - 1, s)
+                if is_safe(tops[col], heights): return [move]
+                progress.append(move)
+            first = max(1, length - faceup[col])
+            for row in range(first, length):
+                card = cards[row]
+                for dest in range(7):
+                    if dest == col: continue
+                    if tops[dest] == EMPTY:
+                        if not to_empty_column(row, dest, empty): continue
+                    if STACK_DOWN[card * NUM_CARDS + tops[dest]]:
+                        move = Move(COL_TO_COL, col, row, dest)
+                        if row == first and row > 1:
+                            uncover.append(move)
+                        elif row == 1 or self.frees(cards[row - 1], drawn):
+                            lateral.append(move)
+
+        if board.draw:
+            card = board.draw[-1]
+            s = self.foundation_for(card)
+            if s >= 0:
+                move = Move(DRAW_TO_ACCUM, None, None, s)
+                if is_safe(card, heights): return [move]
+                progress.append(move)
+            for dest in range(7):
+                if (tops[dest] == EMPTY and
+                        not to_empty_column(None, dest, empty)): continue
+                if STACK_DOWN[card * NUM_CARDS + tops[dest]]:
+                    waste.append(Move(DRAW_TO_COL, None, None, dest))
+
+        for s in range(4):
+            card = stacks[s][-1]
+            if card == EMPTY or not self.is_wanted(card, drawn): continue
+            for dest in range(7):
+                if (tops[dest] == EMPTY and
+                        not to_empty_column(None, dest, empty)): continue
+                if STACK_DOWN[card * NUM_CARDS + tops[dest]]:
+                    back.append(Move(ACCUM_TO_COL, s, None, dest))
+
+        moves = back + lateral
+        drawable = []
+        for card, draws in board.talon_index().reachable(len(board.draw)):
+            if draws == 0: continue
+            if (self.foundation_for(card) >= 0 or
+                    self.is_wanted_draw(card, tops, empty)):
+                drawable.append(Move(DRAW_UNTIL, card, draws, None))
+        moves.extend(reversed(drawable)) # the nearest card is searched first
+        moves.extend(waste)
+        moves.extend(uncover)
+        moves.extend(progress)
+        return moves
+
+    # is_wanted_draw : card [card] int -> bool
+    # Returns whether a card from the stock could go on a column
+    def is_wanted_draw(self, card, tops, empty):
+        for col in range(7):
+            if tops[col] == EMPTY and not to_empty_column(None, col, empty):
+                continue
+            if STACK_DOWN[card * NUM_CARDS + tops[col]]: return True
+        return False
+
+    # frees : card card -> bool
+    # Returns whether uncovering a card lets it, or the draw card, move on
+    def frees(self, card, drawn):
+        return (self.foundation_for(card) >= 0 or
+                STACK_DOWN[drawn * NUM_CARDS + card] == 1)
+
+    # is_wanted : card card -> bool
+    # Returns whether the draw card or any face up card could go on a card
+    def is_wanted(self, card, drawn):
+        if STACK_DOWN[drawn * NUM_CARDS + card]: return True
+        board = self.board
+        for col in range(7):
+            cards = board.columns[col]
+            for row in range(max(1, len(cards) - board.faceup[col]),
+                             len(cards)):
+                if STACK_DOWN[cards[row] * NUM_CARDS + card]: return True
+        return False
+
+    # take_from_column : int int int -> array
+    # Removes the cards from row onwards out of a column, turning over the
+    # card underneath if it was face down, and hashes them into dest_pile
+    def take_from_column(self, col, row, dest_pile):
+        board = self.board
+        cards = board.columns[col]
+        moving = cards[row:]
+        del cards[row:]
+        h = self.hash
+        for card in moving:
+            h ^= (KEYS[card * PILES + FACEUP + col] ^
+                  KEYS[card * PILES + dest_pile])
+        faceup = board.faceup[col] - len(moving)
+        if faceup <= 0:
+            faceup = 1
+            if len(cards) > 1: # a face down card gets turned over
+                card = cards[-1]
+                h ^= (KEYS[card * PILES + FACEDOWN + col] ^
+                      KEYS[card * PILES + FACEUP + col])
+        board.faceup[col] = faceup
+        self.hash = h
+        return moving
+
+    # play : Move -> token
+    # Makes a move on the board and returns what unplay needs to reverse it
+    def play(self, move):
+        board = self.board
+        kind = move.kind
+        if kind == DRAW:
+            h = self.hash
+            if board.stock:
+                count = min(3, len(board.stock))
+                for i in range(count):
+                    card = board.stock.pop()
+                    board.draw.append(card)
+                    h ^= KEYS[card * PILES + STOCK] ^ KEYS[card * PILES + WASTE]
+            else:
+                count = 0 # turn the draw pile over into the stock
+                for card in board.draw:
+                    h ^= KEYS[card * PILES + WASTE] ^ KEYS[card * PILES + STOCK]
+                board.stock, board.draw = board.draw, board.stock
+                board.stock.reverse()
+            self.hash = h
+            return count
+        if kind == DRAW_UNTIL:
+            return [self.play(DRAW_MOVE) for draw in range(move.row)]
+
+        if kind == COL_TO_COL:
+            src_faceup = board.faceup[move.src]
+            moving = self.take_from_column(move.src, move.row,
+                                           FACEUP + move.dst)
+            token = (src_faceup, board.faceup[move.dst], len(moving))
+            board.columns[move.dst].extend(moving)
+            board.faceup[move.dst] += len(moving)
+        elif kind == COL_TO_ACCUM:
+            token = board.faceup[move.src]
+            moving = self.take_from_column(move.src, move.row, FOUNDATION)
+            board.stacks[move.dst].append(moving[0])
+        elif kind == DRAW_TO_COL:
+            token = board.faceup[move.dst]
+            card = board.draw.pop()
+            board.columns[move.dst].append(card)
+            board.faceup[move.dst] += 1
+            self.hash ^= (KEYS[card * PILES + WASTE] ^
+                          KEYS[card * PILES + FACEUP + move.dst])
+        elif kind == DRAW_TO_ACCUM:
+            token = None
+            card = board.draw.pop()
+            board.stacks[move.dst].append(card)
+            self.hash ^= (KEYS[card * PILES + WASTE] ^
+                          KEYS[card * PILES + FOUNDATION])
+        else:
+            token = board.faceup[move.dst]
+            card = board.stacks[move.src].pop()
+            board.columns[move.dst].append(card)
+            board.faceup[move.dst] += 1
+            self.hash ^= (KEYS[card * PILES + FOUNDATION] ^
+                          KEYS[card * PILES + FACEUP + move.dst])
+        return token
+
+    # unplay : Move token -> void
+    # Reverses a move made by play. The caller restores the hash.
+    def unplay(self, move, token):
+        board = self.board
+        kind = move.kind
+        if kind == DRAW:
+            if token == 0:
+                board.stock.reverse()
+                board.stock, board.draw = board.draw, board.stock
+            else:
+                for i in range(token):
+                    board.stock.append(board.draw.pop())
+        elif kind == DRAW_UNTIL:
+            for count in reversed(token):
+                self.unplay(DRAW_MOVE, count)
+        elif kind == COL_TO_COL:
+            src_faceup, dst_faceup, count = token
+            dest = board.columns[move.dst]
+            board.columns[move.src].extend(dest[-count:])
+            del dest[-count:]
+            board.faceup[move.src] = src_faceup
+            board.faceup[move.dst] = dst_faceup
+        elif kind == COL_TO_ACCUM:
+            board.columns[move.src].append(board.stacks[move.dst].pop())
+            board.faceup[move.src] = token
+        elif kind == DRAW_TO_COL:
+            board.draw.append(board.columns[move.dst].pop())
+            board.faceup[move.dst] = token
+        elif kind == DRAW_TO_ACCUM:
+            board.draw.append(board.stacks[move.dst].pop())
+        else:
+            board.stacks[move.src].append(board.columns[move.dst].pop())
+            board.faceup[move.dst] = token
@@ -0,0 +1,240 @@
+# Stats.py - A SQLite store of played games, with running totals
+
+from Solver import WON, LOST
+from collections import namedtuple
+import Moves
+import sqlite3
+import time
+
+# Every finished game is one row of the games table. Results are held in
+# memory and written a batch at a time, each batch in one transaction, and
+# the same transaction adds the batch to the summary tables, so reading
+# totals, win rates by day or the spread of moves to win never has to scan
+# the games themselves. The database runs in WAL mode: readers never wait
+# for a writer, and several processes can add games to the same file.
+
+# Modes
+PLAY = "play"         # played at the terminal
+AUTOPLAY = "autoplay" # finished by autoplay (auto.py)
+SOLVE = "solve"       # searched by the solver (solve.py)
+
+# A GameRecord is one game's row.
+
+# mode: PLAY, AUTOPLAY or SOLVE
+# deal: Microsoft-style deal number, or None if the deck was shuffled
+# outcome: WON, LOST or UNKNOWN (the solver ran out of nodes or time)
+# moves: Card moves made, or in the solution when solving
+# draws, passes: Draws from the stock and times it was turned over, or None
+#  when solving
+# elapsed: Wall-clock seconds spent on the game
+# reason: Why the deal was lost without playing it (see Deadlock.py), or None
+
+GameRecord = namedtuple("GameRecord",
+                        "mode deal outcome moves draws passes elapsed reason")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    finished REAL NOT NULL,
+    mode TEXT NOT NULL,
+    deal INTEGER,
+    outcome TEXT NOT NULL,
+    moves INTEGER NOT NULL,
+    draws INTEGER,
+    passes INTEGER,
+    elapsed REAL NOT NULL,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS games_deal ON games (deal);
+CREATE TABLE IF NOT EXISTS totals (
+    mode TEXT PRIMARY KEY,
+    games INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    moves INTEGER NOT NULL DEFAULT 0,
+    elapsed REAL NOT NULL DEFAULT 0,
+    best_time REAL,
+    fewest_moves INTEGER
+);
+CREATE TABLE IF NOT EXISTS daily (
+    mode TEXT NOT NULL,
+    day TEXT NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (mode, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS win_moves (
+    mode TEXT NOT NULL,
+    moves INTEGER NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (mode, moves)
+) WITHOUT ROWID;
+"""
+
+# from_result : GameResult string -> GameRecord
+# Makes a record from a Simulator or Batch result
+def from_result(result, mode=AUTOPLAY):
+    return GameRecord(mode, result.deal, WON if result.won else LOST,
+                      result.moves, result.draws, result.passes,
+                      result.elapsed, result.reason)
+
+# from_game : Solitaire float string -> GameRecord
+# Makes a record from a game's journal, once it's over
+def from_game(game, elapsed, mode=PLAY):
+    moves = draws = passes = 0
+    for entry in game.journal.done:
+        if entry.move.kind != Moves.DRAW:
+            moves += 1
+        elif entry.count > 0:
+            draws += 1
+        else:
+            passes += 1
+    return GameRecord(mode, game.deck.deal, WON if game.is_won() else LOST,
+                      moves, draws, passes, elapsed, None)
+
+# from_solve : int SolveResult -> GameRecord
+# Makes a record from the solver's result for a deal
+def from_solve(deal, result):
+    moves = 0
+    for move in result.moves:
+        if move.kind != Moves.DRAW and move.kind != Moves.DRAW_UNTIL:
+            moves += 1
+    return GameRecord(SOLVE, deal, result.status, moves, None, None,
+                      result.elapsed, result.reason)
+
+class Stats(object):
+
+    # __init__ : path int -> void
+    # Opens a statistics database, creating it if it doesn't exist. Records
+    # are written in groups of batch, and any left over on flush or close.
+    def __init__(self, path, batch=1000):
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        self.db.executescript(SCHEMA)
+        self.batch = batch
+        self.pending = []
+
+    # record : GameRecord -> void
+    def record(self, record):
+        self.pending.append(record)
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    # record_many : [GameRecord] -> void
+    def record_many(self, records):
+        self.pending.extend(records)
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    # flush : void
+    # Writes every waiting record and updates the summary tables, all in one
+    # transaction
+    def flush(self):
+        if not self.pending: return
+        records = self.pending
+        self.pending = []
+        now = time.time()
+        day = time.strftime("%Y-%m-%d", time.localtime(now))
+
+        # Sum the batch up first, so each summary row is touched once
+        totals = {}
+        daily = {}
+        win_moves = {}
+        for r in records:
+            won = r.outcome == WON
+            total = totals.setdefault(r.mode, [0, 0, 0, 0.0, None, None])
+            total[0] += 1
+            total[1] += won
+            total[2] += r.moves
+            total[3] += r.elapsed
+            counts = daily.setdefault((r.mode, day), [0, 0])
+            counts[0] += 1
+            counts[1] += won
+            if won:
+                if total[4] is None or r.elapsed < total[4]:
+                    total[4] = r.elapsed
+                if total[5] is None or r.moves < total[5]:
+                    total[5] = r.moves
+                key = (r.mode, r.moves)
+                win_moves[key] = win_moves.get(key, 0) + 1
+
+        db = self.db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(
+                "INSERT INTO games (finished, mode, deal, outcome, moves, "
+                "draws, passes, elapsed, reason) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(now,) + tuple(r) for r in records])
+            db.executemany("INSERT OR IGNORE INTO totals (mode) VALUES (?)",
+                           [(mode,) for mode in totals])
+            # min() of anything and NULL is NULL, so fall back to whichever
+            # of the old and new bests there is
+            db.executemany(
+                "UPDATE totals SET games = games + ?, wins = wins + ?, "
+                "moves = moves + ?, elapsed = elapsed + ?, "
+                "best_time = coalesce(min(best_time, ?), best_time, ?), "
+                "fewest_moves = coalesce(min(fewest_moves, ?), "
+                "fewest_moves, ?) WHERE mode = ?",
+                [(t[0], t[1], t[2], t[3], t[4], t[4], t[5], t[5], mode)
+                 for mode, t in totals.items()])
+            db.executemany(
+                "INSERT OR IGNORE INTO daily (mode, day) VALUES (?, ?)",
+                daily.keys())
+            db.executemany(
+                "UPDATE daily SET games = games + ?, wins = wins + ? "
+                "WHERE mode = ? AND day = ?",
+                [(c[0], c[1], mode, d) for (mode, d), c in daily.items()])
+            db.executemany(
+                "INSERT OR IGNORE INTO win_moves (mode, moves) VALUES (?, ?)",
+                win_moves.keys())
+            db.executemany(
+                "UPDATE win_moves SET games = games + ? "
+                "WHERE mode = ? AND moves = ?",
+                [(n, mode, moves) for (mode, moves), n in win_moves.items()])
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            self.pending = records + self.pending
+            raise
+
+    # totals : string -> [(mode, games, wins, moves, elapsed, best_time,
+    #                      fewest_moves)]
+    # Returns the running totals for one mode, or every mode. best_time and
+    # fewest_moves are over won games, and None until one is won.
+    def totals(self, mode=None):
+        return self.query("totals", mode, "mode")
+
+    # win_rate : string -> [(mode, day, games, wins)]
+    # Returns how many games were played and won each day, oldest first
+    def win_rate(self, mode=None):
+        return self.query("daily", mode, "mode, day")
+
+    # moves_to_win : string -> [(mode, moves, games)]
+    # Returns how many games were won in each number of moves
+    def moves_to_win(self, mode=None):
+        return self.query("win_moves", mode, "mode, moves")
+
+    # query : string string string -> [tuple]
+    # Returns a summary table's rows, for one mode if mode isn't None
+    def query(self, table, mode, order):
+        sql = "SELECT * FROM " + table
+        args = ()
+        if mode is not None:
+            sql += " WHERE mode = ?"
+            args = (mode,)
+        return self.db.execute(sql + " ORDER BY " + order, args).fetchall()
+
+    # close : void
+    # Writes any waiting records and closes the database
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,59 @@
+# StockIndex.py - Which draw cards a draw-three stock can bring to the top
+
+# Drawing never changes the order the stock and draw pile go through: put
+# the draw pile (bottom first) in front of the stock (next card first) and
+# every pass deals that same list out three at a time. Only a card leaving
+# the draw pile changes it, so a StockIndex is built for one talon order
+# and reused, at any point in a pass, until then.
+
+# order: The talon in pass order
+# shown: Positions in order that a pass from the start turns to the top:
+#  every third card, and the last one
+
+class StockIndex(object):
+    __slots__ = ("order", "shown")
+
+    # __init__ : [card] [card] -> void
+    # Takes the draw pile and the stock as Solitaire or Board keep them
+    def __init__(self, draw, stock):
+        self.order = list(draw)
+        self.order.extend(reversed(stock))
+        length = len(self.order)
+        self.shown = range(2, length, 3)
+        if length % 3: self.shown.append(length - 1)
+
+    # reachable : int -> [(card, int)]
+    # Lists every card that can be brought to the top of the draw pile, with
+    # how many draws it takes (turning the stock over counts as one), from
+    # the point in the pass where the draw pile holds drawn cards. Cards are
+    # listed soonest first: the current draw card, the rest of this pass,
+    # then the next pass. Later passes repeat the next one.
+    def reachable(self, drawn):
+        order = self.order
+        length = len(order)
+        cards = []
+        if drawn > 0:
+            cards.append((order[drawn - 1], 0))
+        draws = 0
+        pos = drawn
+        while pos < length:
+            pos = min(pos + 3, length)
+            draws += 1
+            cards.append((order[pos - 1], draws))
+        if length == 0: return cards
+
+        listed = set(card for card, count in cards)
+        draws += 1 # turn the stock over
+        for pos in self.shown:
+            draws += 1
+            if order[pos] not in listed:
+                cards.append((order[pos], draws))
+        return cards
+
+    # draws_until : int function -> int
+    # Returns how many draws it takes to bring a card that satisfies playable
+    # to the top, or None if no card ever will
+    def draws_until(self, drawn, playable):
+        for card, draws in self.reachable(drawn):
+            if playable(card): return draws
+        return None
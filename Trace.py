@@ -0,0 +1,276 @@
+# Trace.py - Compact move traces of whole games, and a fast replayer
+
+from Board import Board, EMPTY, NUM_CARDS, STACK_DOWN, STACK_UP
+from Deck import Deck
+from Moves import (Move, DRAW_TO_COL, DRAW_TO_ACCUM, COL_TO_ACCUM,
+                   COL_TO_COL, ACCUM_TO_COL, DRAW, DRAW_UNTIL)
+from Solitaire import Solitaire
+from Zobrist import board_hash
+from array import array
+import base64
+import struct
+
+# A trace is everything needed to play a game again exactly: the deal and
+# every move and draw made since, in order. Traces come from the journal, so
+# a game records one whether it was played by hand, by autoplay or by the
+# solver, and a move that was undone isn't in it.
+
+# Encoded, a trace is little-endian:
+
+# magic, version: "PYKT" and VERSION
+# flags: Bit 0 means the deal is a deck rank (Deck.rank) rather than a
+#  Microsoft-style deal number
+# final: board_hash of the position the trace ends in
+# count: How many moves follow
+# deal: The deal number as 4 bytes, or the rank as RANK_SIZE bytes
+# moves: Two bytes per move; see encode_move
+
+# Traces are written as text, one per line, with base64.
+
+MAGIC = "PYKT"
+VERSION = 1
+RANK_DEAL = 1
+RANK_SIZE = 29 # 52! fits in 226 bits
+HEADER = struct.Struct("<4sBBQI")
+NONE = 7 # src or dst not used
+
+# encode_move : Move -> int
+# Packs a move into 14 bits: kind, src, row (0 for none) and dst
+def encode_move(move):
+    src = NONE if move.src is None else move.src
+    dst = NONE if move.dst is None else move.dst
+    return move.kind << 11 | src << 8 | (move.row or 0) << 3 | dst
+
+# decode_move : int -> Move
+def decode_move(code):
+    src = code >> 8 & 7
+    row = code >> 3 & 31
+    dst = code & 7
+    return Move(code >> 11, None if src == NONE else src, row or None,
+                None if dst == NONE else dst)
+
+# A Trace holds the deal and the encoded moves.
+
+# deal: A Microsoft-style deal number, or None
+# rank: The deck's rank, used when deal is None
+# codes: An array of encoded moves
+# final: board_hash of the last position, or None if it isn't known
+
+class Trace(object):
+    __slots__ = ("deal", "rank", "codes", "final")
+
+    def __init__(self, deal=None, rank=None, codes=None, final=None):
+        self.deal = deal
+        self.rank = rank
+        self.codes = array('H', codes or [])
+        self.final = final
+
+    # record : Solitaire -> Trace
+    # Takes the trace of a game from its deal to where it is now. A game
+    # loaded from a Snapshot doesn't know its earlier moves, so it can't be
+    # traced.
+    @classmethod
+    def record(cls, game):
+        deck = game.deck
+        if deck.order is None:
+            raise ValueError("the game doesn't go back to its deal")
+        trace = cls(deck.deal, deck.rank() if deck.deal is None else None,
+                    [encode_move(entry.move) for entry in game.journal.done])
+        trace.final = board_hash(Board.from_solitaire(game))
+        return trace
+
+    # moves : [Move]
+    def moves(self):
+        return [decode_move(code) for code in self.codes]
+
+    # deck : Deck
+    # Returns a fresh deck for the trace's deal
+    def deck(self):
+        if self.deal is not None:
+            return Deck(deal=self.deal)
+        return Deck.from_rank(self.rank)
+
+    # game : Solitaire
+    # Deals the trace's game and makes all of its moves, for a closer look.
+    # Keyword arguments go to Solitaire.
+    def game(self, **kwargs):
+        game = Solitaire(deck=self.deck(), **kwargs)
+        game.check_possible_moves()
+        for move in self.moves():
+            game.apply_move(move)
+        return game
+
+    # pack : string
+    def pack(self):
+        if self.deal is not None:
+            flags = 0
+            deal = struct.pack("<I", self.deal)
+        else:
+            flags = RANK_DEAL
+            deal = ("%0*x" % (RANK_SIZE * 2, self.rank)).decode("hex")
+        return (HEADER.pack(MAGIC, VERSION, flags, self.final or 0,
+                            len(self.codes)) + deal + self.codes.tostring())
+
+    # unpack : string -> Trace
+    @classmethod
+    def unpack(cls, data):
+        magic, version, flags, final, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a version %d trace" % VERSION)
+        i = HEADER.size
+        trace = cls(final=final or None)
+        if flags & RANK_DEAL:
+            trace.rank = int(data[i:i + RANK_SIZE].encode("hex"), 16)
+            i += RANK_SIZE
+        else:
+            trace.deal = struct.unpack_from("<I", data, i)[0]
+            i += 4
+        if len(data) != i + 2 * count:
+            raise ValueError("trace is the wrong length")
+        trace.codes.fromstring(data[i:])
+        return trace
+
+    # to_text : string
+    def to_text(self):
+        return base64.b64encode(self.pack())
+
+    # from_text : string -> Trace
+    @classmethod
+    def from_text(cls, text):
+        try:
+            data = base64.b64decode(text.strip())
+        except TypeError:
+            raise ValueError("trace isn't base64")
+        return cls.unpack(data)
+
+    def __len__(self):
+        return len(self.codes)
+
+# A ReplayResult says how a replay went.
+
+# ok: Whether every move was legal and the trace ended where it was recorded
+# moves: How many moves were made
+# error: Why the replay stopped, or None
+# board: The Board the replay ended on
+# won: Whether that board is won
+
+class ReplayResult(object):
+    __slots__ = ("ok", "moves", "error", "board", "won")
+
+    def __init__(self, ok, moves, error, board, won):
+        self.ok = ok
+        self.moves = moves
+        self.error = error
+        self.board = board
+        self.won = won
+
+    def __repr__(self):
+        return "ReplayResult(%s, %d moves%s)" % (
+            "ok" if self.ok else "failed", self.moves,
+            "" if self.error is None else ", " + self.error)
+
+# A Replayer checks each move of a trace against the rules and makes it on
+# a Board. Nothing is rendered, hinted, journaled or hashed along the way
+# (the final position is hashed once at the end), so it runs far faster than
+# a Solitaire game.
+
+class Replayer(object):
+
+    def __init__(self):
+        self.board = None
+
+    # replay : Trace -> ReplayResult
+    def replay(self, trace):
+        game = Solitaire(deck=trace.deck())
+        self.board = board = Board.from_solitaire(game)
+        count = 0
+        error = None
+        make = self.make
+        for code in trace.codes:
+            error = make(code >> 11, code >> 8 & 7, code >> 3 & 31, code & 7)
+            if error is not None:
+                error = "move %d %r: %s" % (count + 1, decode_move(code),
+                                            error)
+                break
+            count += 1
+        else:
+            if trace.final is not None and board_hash(board) != trace.final:
+                error = "ends in a different position"
+        return ReplayResult(error is None, count, error, board,
+                            board.is_won())
+
+    # make : int int int int -> string
+    # Makes an encoded move (src and dst are NONE, and row 0, when unused),
+    # or returns why it can't be made and leaves the board alone
+    def make(self, kind, src, row, dst):
+        board = self.board
+        if kind == DRAW:
+            self.draw()
+            return None
+        if kind == DRAW_UNTIL:
+            if not row: return "draws nothing"
+            for draw in range(row):
+                self.draw()
+            return None
+
+        if kind == DRAW_TO_COL or kind == DRAW_TO_ACCUM:
+            if not board.draw: return "the draw pile is empty"
+            card = board.draw[-1]
+        elif kind == ACCUM_TO_COL:
+            if src > 3: return "no such pile"
+            card = board.stacks[src][-1]
+            if card == EMPTY: return "the pile is empty"
+        elif kind == COL_TO_COL or kind == COL_TO_ACCUM:
+            if src > 6: return "no such column"
+            cards = board.columns[src]
+            if not max(1, len(cards) - board.faceup[src]) <= row < len(cards):
+                return "no face up card there"
+            if kind == COL_TO_ACCUM and row != len(cards) - 1:
+                return "not the top card"
+            card = cards[row]
+        else:
+            return "unknown kind"
+
+        if kind == DRAW_TO_ACCUM or kind == COL_TO_ACCUM:
+            if dst > 3: return "no such pile"
+            stack = board.stacks[dst]
+            if not STACK_UP[card * NUM_CARDS + stack[-1]]:
+                return "doesn't go on that pile"
+            stack.append(card)
+        else:
+            if dst > 6: return "no such column"
+            if kind == COL_TO_COL and dst == src:
+                return "the card is already there"
+            dest = board.columns[dst]
+            if not STACK_DOWN[card * NUM_CARDS + dest[-1]]:
+                return "doesn't go on that column"
+            if kind == COL_TO_COL:
+                dest.extend(cards[row:])
+                board.faceup[dst] += len(cards) - row
+            else:
+                dest.append(card)
+                board.faceup[dst] += 1
+
+        if kind == DRAW_TO_COL or kind == DRAW_TO_ACCUM:
+            board.draw.pop()
+        elif kind == ACCUM_TO_COL:
+            board.stacks[src].pop()
+        else:
+            board.faceup[src] = max(1, board.faceup[src] - (len(cards) - row))
+            del cards[row:]
+        return None
+
+    # draw : void
+    # Draws up to three cards, or turns the draw pile over into the stock
+    def draw(self):
+        board = self.board
+        if board.stock:
+            for i in range(min(3, len(board.stock))):
+                board.draw.append(board.stock.pop())
+        else:
+            board.stock, board.draw = board.draw, board.stock
+            board.stock.reverse()
+
+# replay : Trace -> ReplayResult
+def replay(trace):
+    return Replayer().replay(trace)
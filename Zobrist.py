@@ -0,0 +1,63 @@
+# Zobrist.py - Zobrist keys for hashing Solitaire positions
+
+from Board import EMPTY
+import random
+
+# Every card gets a random 64-bit key for every pile it can be in. A position
+# hashes to the XOR of the keys of all 52 cards, so moving a card from one
+# pile to another updates the hash with two XORs.
+
+# The order of the cards within a pile never needs hashing: face down cards
+# keep their dealt order, face up runs are in rank order, and the stock and
+# draw pile always hold what's left of the dealt order, split at one point.
+# Which accumulation pile a card sits on doesn't matter either, so all four
+# share one pile.
+
+FACEUP = 0    # 0-6: face up in column 0-6
+FACEDOWN = 7  # 7-13: face down in column 0-6
+STOCK = 14
+WASTE = 15    # the face up draw pile
+FOUNDATION = 16
+PILES = 17
+
+_rng = random.Random(0x5eed) # fixed, so hashes agree between processes
+KEYS = [_rng.getrandbits(64) for _key in range(52 * PILES)]
+
+# key : card pile -> int
+# Returns the key for an integer card lying in the given pile
+def key(card, pile):
+    return KEYS[card * PILES + pile]
+
+# position_hash : Board -> int
+# Hashes a Board from scratch, treating the stock and draw pile as one pile,
+# so drawing and turning over the stock don't change a position's hash
+def position_hash(board):
+    h = board_hash(board)
+    for card in board.draw:
+        h ^= KEYS[card * PILES + WASTE] ^ KEYS[card * PILES + STOCK]
+    return h
+
+# facedown_count : Board int -> int
+# Returns how many cards in a column are face down
+def facedown_count(board, col):
+    return max(0, len(board.columns[col]) - 1 - board.faceup[col])
+
+# board_hash : Board -> int
+# Hashes a whole Board from scratch
+def board_hash(board):
+    h = 0
+    for col in range(7):
+        cards = board.columns[col]
+        down = facedown_count(board, col)
+        for row in range(1, len(cards)):
+            pile = FACEDOWN + col if row <= down else FACEUP + col
+            h ^= KEYS[cards[row] * PILES + pile]
+    for card in board.stock:
+        h ^= KEYS[card * PILES + STOCK]
+    for card in board.draw:
+        h ^= KEYS[card * PILES + WASTE]
+    for stack in board.stacks:
+        for card in stack:
+            if card != EMPTY:
+                h ^= KEYS[card * PILES + FOUNDATION]
+    return h
@@ -1,19 +1,88 @@
-# This is an automatic player for Solitaire. It will keep track of wins and
-# losses. Use CTRL + C to quit and see the tally.
+# This is an automatic player for Solitaire. It plays a batch of games with
+# autoplay across all CPU cores, prints each result as it comes in, and keeps
+# track of wins and losses. Use CTRL + C to quit early and see the tally.
+# With --batch, all the games are played together in one process with NumPy.
+# With --stats, every game is also added to a statistics database.
 
-from Solitaire import Solitaire
+from HintEngine import HintEngine
+from Simulator import run_batch
+from Stats import Stats, from_result
+import argparse
+
+parser = argparse.ArgumentParser(description="Run Solitaire autoplay in bulk.")
+parser.add_argument("-n", "--games", type=int, default=1000,
+                    help="number of games to play (default 1000)")
+parser.add_argument("-f", "--first", type=int, default=1,
+                    help="first deal number to play (default 1)")
+parser.add_argument("-w", "--workers", type=int, default=None,
+                    help="worker processes (default: one per CPU)")
+parser.add_argument("-b", "--batch", action="store_true",
+                    help="play every game at once with NumPy (Batch.py)")
+parser.add_argument("-l", "--lookahead", type=float, default=None,
+                    metavar="SECONDS",
+                    help="rank hints by looking ahead, for up to this long "
+                         "per hint")
+parser.add_argument("-t", "--traces", default=None, metavar="FILE",
+                    help="write each game's trace to FILE, one per line, "
+                         "for replay.py")
+parser.add_argument("-s", "--stats", default=None, metavar="FILE",
+                    help="record every game in the statistics database FILE "
+                         "(see Stats.py)")
+parser.add_argument("-q", "--quiet", action="store_true",
+                    help="only print the final tally")
+args = parser.parse_args()
+if args.batch and args.traces:
+    parser.error("--batch games don't record traces")
 
 wins = 0
 losses = 0
+rejected = 0
+errors = 0
+traces = open(args.traces, "w") if args.traces else None
+stats = Stats(args.stats) if args.stats else None
 
-while True:
-    try:
-        sol = Solitaire()
-        if sol.auto_run() == True:
+try:
+    if args.batch:
+        from Batch import play_deals
+        results = play_deals(args.games, args.first)
+    else:
+        policy = None
+        if args.lookahead is not None:
+            policy = HintEngine(args.lookahead)
+        results = run_batch(args.games, args.workers, args.first,
+                            policy=policy, record=traces is not None)
+    for result in results:
+        if result.trace is not None:
+            traces.write(result.trace + "\n")
+        if result.error is not None:
+            errors += 1
+            print "Deal " + str(result.deal) + " failed:\n" + result.error
+            continue
+        if stats is not None:
+            stats.record(from_result(result))
+        if result.won:
             wins += 1
         else:
             losses += 1
-    except KeyboardInterrupt:
-        print "\nWins: " + str(wins)
-        print "Losses: " + str(losses)
-        exit(1)
\ No newline at end of file
+        if result.reason is not None:
+            rejected += 1
+            if not args.quiet:
+                print "Deal %d: lost at the deal (%s)" % (result.deal,
+                                                          result.reason)
+            continue
+        if not args.quiet:
+            print ("Deal %d: %s in %d moves, %d draws, %.3fs" %
+                   (result.deal, "won" if result.won else "lost",
+                    result.moves, result.draws, result.elapsed))
+except KeyboardInterrupt:
+    print
+if traces is not None:
+    traces.close()
+if stats is not None:
+    stats.close()
+print "Wins: " + str(wins)
+print "Losses: " + str(losses)
+if rejected:
+    print "Rejected at the deal: " + str(rejected)
+if errors:
+    print "Errors: " + str(errors)
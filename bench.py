@@ -0,0 +1,154 @@
+# This benchmarks the engine's hot paths on a fixed set of deals. Results are
+# written as JSON; pass an earlier run as a baseline to flag anything that got
+# slower.
+
+from Solitaire import Solitaire
+import Moves
+import argparse
+import json
+import platform
+import sys
+import time
+
+DEALS = range(1, 51)
+
+# positions : [Solitaire]
+# Returns a game per deal, partway through (a few moves made, cards drawn)
+def positions():
+    games = []
+    for deal in DEALS:
+        sol = Solitaire(deal=deal)
+        sol.check_possible_moves()
+        for step in range(deal % 7 + 3):
+            if sol.hint_move is not None:
+                sol.apply_move(sol.hint_move)
+            else:
+                sol.draw_from_stock()
+        games.append(sol)
+    return games
+
+# Each benchmark takes the games from positions() and returns how many
+# operations it timed.
+
+# bench_check_possible_moves : [Solitaire] -> int
+# Runs the hint search over and over on each game
+def bench_check_possible_moves(games):
+    for sol in games:
+        for i in range(200):
+            sol.check_possible_moves()
+    return len(games) * 200
+
+# bench_parse_move : [Solitaire] -> int
+# Parses a move from the top of every column to every destination
+def bench_parse_move(games):
+    count = 0
+    for sol in games * 10:
+        for col in range(1, 8):
+            source = str(col) + str(len(sol.columns[col - 1]) - 1)
+            for dest in ["DC", "A1", "A2", "A3", "A4"] + [
+                    str(d) + str(len(sol.columns[d - 1])) for d in range(1, 8)]:
+                sol.parse_move(source, dest)
+                count += 1
+    return count
+
+# bench_draw_cards : [Solitaire] -> int
+# Draws through the stock ten times on a fresh game of every deal
+def bench_draw_cards(games):
+    count = 0
+    for deal in DEALS:
+        sol = Solitaire(deal=deal)
+        for i in range(240): # ten passes through the stock
+            sol.draw_from_stock()
+            count += 1
+    return count
+
+# bench_backup_undo : [Solitaire] -> int
+# Makes and undoes each legal move of each game, journal and all
+def bench_backup_undo(games):
+    count = 0
+    for sol in games:
+        moves = Moves.legal_moves(sol) or [Moves.Move(Moves.DRAW, None,
+                                                      None, None)]
+        for i in range(20):
+            for move in moves:
+                sol.apply_move(move)
+                sol.revert(sol.journal.undo())
+                count += 1
+    return count
+
+# bench_auto_run : [Solitaire] -> int
+# Plays every deal to the end with autoplay
+def bench_auto_run(games):
+    for deal in DEALS:
+        Solitaire(deal=deal).play_auto()
+    return len(DEALS)
+
+BENCHMARKS = [
+    ("check_possible_moves", bench_check_possible_moves),
+    ("parse_move", bench_parse_move),
+    ("draw_cards", bench_draw_cards),
+    ("backup_undo", bench_backup_undo),
+    ("auto_run_games", bench_auto_run),
+]
+
+# run : int -> dict
+# Runs every benchmark, keeping the best of several repeats
+def run(repeats):
+    results = {}
+    for name, bench in BENCHMARKS:
+        best = None
+        for i in range(repeats):
+            games = positions()
+            start = time.time()
+            ops = bench(games)
+            elapsed = time.time() - start
+            if best is None or elapsed < best[1]:
+                best = (ops, elapsed)
+        results[name] = {"ops": best[0], "seconds": best[1],
+                         "ops_per_sec": best[0] / best[1]}
+    return results
+
+# regressions : dict dict float -> [string]
+# Lists benchmarks that are slower than the baseline by more than tolerance
+def regressions(results, baseline, tolerance):
+    slower = []
+    for name in sorted(results):
+        if name not in baseline: continue
+        was = baseline[name]["ops_per_sec"]
+        now = results[name]["ops_per_sec"]
+        if now < was * (1 - tolerance):
+            slower.append("%s: %.0f ops/s, down from %.0f (%.0f%%)" %
+                          (name, now, was, 100.0 * (now - was) / was))
+    return slower
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the engine.")
+    parser.add_argument("-o", "--output", help="write results to this file")
+    parser.add_argument("-b", "--baseline", help="compare against this file")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.10,
+                        help="allowed slowdown against the baseline "
+                             "(default 0.10)")
+    parser.add_argument("-r", "--repeats", type=int, default=3,
+                        help="runs per benchmark; the best counts "
+                             "(default 3)")
+    args = parser.parse_args()
+
+    report = {"python": platform.python_version(),
+              "platform": platform.platform(),
+              "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "benchmarks": run(args.repeats)}
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print text
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["benchmarks"]
+        slower = regressions(report["benchmarks"], baseline, args.tolerance)
+        for line in slower:
+            sys.stderr.write("Regression: " + line + "\n")
+        if slower:
+            sys.exit(1)
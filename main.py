@@ -2,7 +2,26 @@
 # main.py
 # 5/22/15
 
+from Console import Console
 from Solitaire import Solitaire
+from Stats import Stats, from_game
+import argparse
+import time
 
-sol = Solitaire()
-sol.play()
\ No newline at end of file
+parser = argparse.ArgumentParser(description="Play Solitaire.")
+# Optionally pass a deal number to replay a particular deal
+parser.add_argument("deal", type=int, nargs="?", default=None,
+                    help="deal number to play (default: a random deal)")
+parser.add_argument("-s", "--stats", default=None, metavar="FILE",
+                    help="record the game in the statistics database FILE "
+                         "(see Stats.py)")
+args = parser.parse_args()
+
+sol = Solitaire(deal=args.deal)
+start = time.time()
+try:
+    Console(sol).play()
+finally: # quitting exits from inside the console
+    if args.stats:
+        with Stats(args.stats) as stats:
+            stats.record(from_game(sol, time.time() - start))
@@ -0,0 +1,50 @@
+# This replays recorded games from trace files (one trace per line, as
+# auto.py -t or the "trace" command writes them), checking that every move
+# is still legal and that each game ends where it did when it was recorded.
+# It prints every trace that fails and a tally, and exits with status 1 if
+# any did.
+
+from Trace import Trace, Replayer
+import argparse
+import sys
+import time
+
+parser = argparse.ArgumentParser(description="Replay Solitaire traces.")
+parser.add_argument("files", nargs="+", help="trace files to replay")
+parser.add_argument("-s", "--show", action="store_true",
+                    help="print the final board of each failed trace")
+args = parser.parse_args()
+
+replayer = Replayer()
+games = 0
+moves = 0
+failed = 0
+start = time.time()
+
+for path in args.files:
+    with open(path) as traces:
+        for number, line in enumerate(traces, 1):
+            if not line.strip(): continue
+            games += 1
+            try:
+                trace = Trace.from_text(line)
+            except ValueError as error:
+                failed += 1
+                print "%s:%d: %s" % (path, number, error)
+                continue
+            result = replayer.replay(trace)
+            moves += result.moves
+            if not result.ok:
+                failed += 1
+                print "%s:%d: deal %s: %s" % (path, number,
+                                              trace.deal or "rank " +
+                                              str(trace.rank), result.error)
+                if args.show:
+                    print result.board.to_strings()
+
+elapsed = time.time() - start
+print "Replayed %d games, %d moves in %.2fs (%d moves/s)" % (
+    games, moves, elapsed, moves / max(elapsed, 1e-9))
+print "Failed: " + str(failed)
+if failed:
+    sys.exit(1)
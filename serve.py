@@ -0,0 +1,28 @@
+# This runs the game server, which hosts any number of Solitaire sessions for
+# clients that speak its JSON line protocol (see GameServer.py). Use
+# CTRL + C to stop it.
+
+from GameServer import GameServer
+import argparse
+
+parser = argparse.ArgumentParser(description="Serve Solitaire games.")
+parser.add_argument("-p", "--port", type=int, default=8765,
+                    help="TCP port to listen on (default 8765)")
+parser.add_argument("--host", default="127.0.0.1",
+                    help="address to listen on (default 127.0.0.1)")
+parser.add_argument("-u", "--unix", metavar="PATH",
+                    help="listen on a Unix socket instead")
+parser.add_argument("-i", "--idle", type=float, default=600,
+                    help="seconds before an unused session is dropped "
+                         "(default 600)")
+parser.add_argument("-w", "--workers", type=int, default=None,
+                    help="solver processes (default: one per CPU)")
+args = parser.parse_args()
+
+address = args.unix or (args.host, args.port)
+server = GameServer(address, args.idle, args.workers)
+print "Serving on " + (args.unix or "%s:%d" % address)
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    print
@@ -0,0 +1,45 @@
+# This solves a batch of deals across all CPU cores and records the results
+# in a solved deal file, so later runs can look them up instead of solving
+# them again. With -s, every result is also added to a statistics database.
+
+from Simulator import solve_batch
+from SolvedDeals import DEFAULT_CAPACITY
+import argparse
+
+parser = argparse.ArgumentParser(description="Solve Solitaire deals in bulk.")
+parser.add_argument("file", help="solved deal file to create or add to")
+parser.add_argument("-n", "--games", type=int, default=1000,
+                    help="number of deals to solve (default 1000)")
+parser.add_argument("-f", "--first", type=int, default=1,
+                    help="first deal number to solve (default 1)")
+parser.add_argument("-w", "--workers", type=int, default=None,
+                    help="worker processes (default: one per CPU)")
+parser.add_argument("--nodes", type=int, default=200000,
+                    help="node limit per deal (default 200000)")
+parser.add_argument("--time", type=float, default=None,
+                    help="time limit per deal in seconds")
+parser.add_argument("-c", "--capacity", type=int, default=DEFAULT_CAPACITY,
+                    help="deals a new file has room for (default %d); the "
+                         "file grows if a batch needs more" % DEFAULT_CAPACITY)
+parser.add_argument("-s", "--stats", default=None, metavar="FILE",
+                    help="also record each deal in the statistics database "
+                         "FILE (see Stats.py)")
+args = parser.parse_args()
+
+won = lost = unknown = skipped = 0
+try:
+    for tally in solve_batch(args.file, args.games, args.workers, args.first,
+                             args.nodes, args.time,
+                             stats_path=args.stats, capacity=args.capacity):
+        won += tally[0]
+        lost += tally[1]
+        unknown += tally[2]
+        skipped += tally[3]
+        print "Solved %d deals so far" % (won + lost + unknown)
+except KeyboardInterrupt:
+    print
+print "Winnable: " + str(won)
+print "Not winnable: " + str(lost)
+print "Unknown: " + str(unknown)
+if skipped:
+    print "Skipped (out of range): " + str(skipped)
@@ -0,0 +1,112 @@
+# test_server.py - The game server's protocol, and lots of open connections
+
+from GameServer import GameServer
+import GameServer as server_module
+from Solitaire import Solitaire
+import Snapshot
+import base64
+import json
+import resource
+import socket
+import unittest
+
+CLIENTS = 1100 # two descriptors each puts the server well past FD_SETSIZE
+
+class ServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = GameServer(("127.0.0.1", 0), workers=1)
+        self.address = self.server.socket.getsockname()
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.server.shut_down()
+
+    # connect : socket
+    # Opens a client connection and lets the server accept it
+    def connect(self):
+        client = socket.create_connection(self.address)
+        self.clients.append(client)
+        self.server.serve_once(0)
+        return client
+
+    # request : socket dict -> dict
+    # Sends a request and serves until its reply comes back
+    def request(self, client, message):
+        client.sendall(json.dumps(message) + "\n")
+        client.settimeout(0)
+        data = ""
+        for attempt in range(1000):
+            self.server.serve_once(0.01)
+            try:
+                data += client.recv(65536)
+            except socket.error:
+                continue
+            if data.endswith("\n"):
+                return json.loads(data)
+        self.fail("no reply")
+
+    def test_new_game(self):
+        reply = self.request(self.connect(), {"cmd": "new", "deal": 1})
+        self.assertTrue(reply["ok"])
+        self.assertEqual(reply["deal"], 1)
+
+    def test_deal_out_of_range(self):
+        client = self.connect()
+        for deal in (-1, 1 << 32):
+            reply = self.request(client, {"cmd": "new", "deal": deal})
+            self.assertFalse(reply["ok"])
+        self.assertTrue(self.request(client, {"cmd": "new"})["ok"])
+
+    def test_bad_snapshot(self):
+        data = bytearray(Snapshot.pack(Solitaire(deal=1)))
+        data[-1] = 200 # a card byte array('b') can't hold
+        client = self.connect()
+        reply = self.request(client, {"cmd": "new",
+                                      "snapshot": base64.b64encode(data)})
+        self.assertFalse(reply["ok"])
+        self.assertTrue(self.request(client, {"cmd": "new"})["ok"])
+
+    def test_bad_hint(self):
+        game = Solitaire(deal=1)
+        game.check_possible_moves()
+        fields = list(Snapshot.unpack_fields(Snapshot.pack(game)))
+        fields[8:12] = [0, Snapshot.NONE, Snapshot.NONE, 50] # off the board
+        data = Snapshot.LAYOUT.pack(*fields)
+        client = self.connect()
+        reply = self.request(client, {"cmd": "new",
+                                      "snapshot": base64.b64encode(data)})
+        self.assertFalse(reply["ok"])
+        self.assertEqual(self.server.sessions, {})
+        self.assertTrue(self.request(client, {"cmd": "new"})["ok"])
+
+    def test_command_raises(self):
+        def broken(game): raise IndexError("broken")
+        state = server_module.state
+        server_module.state = broken
+        try:
+            client = self.connect()
+            reply = self.request(client, {"cmd": "new", "deal": 1, "id": 7})
+        finally:
+            server_module.state = state
+        self.assertFalse(reply["ok"])
+        self.assertEqual(reply["id"], 7)
+        self.assertEqual(self.server.sessions, {})
+        self.assertTrue(self.request(client, {"cmd": "new"})["ok"])
+
+    def test_many_connections(self):
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        needed = 2 * CLIENTS + 100
+        if soft < needed:
+            if hard != resource.RLIM_INFINITY and hard < needed:
+                self.skipTest("can't open enough files")
+            resource.setrlimit(resource.RLIMIT_NOFILE, (needed, hard))
+        for i in range(CLIENTS):
+            self.connect()
+        reply = self.request(self.clients[-1], {"cmd": "new", "deal": 2})
+        self.assertTrue(reply["ok"])
+
+if __name__ == "__main__":
+    unittest.main()
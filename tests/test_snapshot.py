@@ -0,0 +1,108 @@
+# test_snapshot.py - Loading snapshots, good and corrupt
+
+from Solitaire import Solitaire
+import Snapshot
+import unittest
+
+# Field offsets in Snapshot.LAYOUT
+POSITION = 4
+HINT = 8
+LENGTHS = 12
+FACEUP = 19
+WASTE = 26
+PILES = 28
+CARDS = 32
+
+# corrupt : string (list -> void) -> string
+# Returns a snapshot with its fields changed by a function
+def corrupt(data, change):
+    fields = list(Snapshot.unpack_fields(data))
+    change(fields)
+    return Snapshot.LAYOUT.pack(*fields)
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.game = Solitaire(deal=5)
+        self.game.play_auto()
+        self.data = Snapshot.pack(self.game)
+
+    def test_round_trip(self):
+        game = Snapshot.unpack(self.data)
+        self.assertEqual(game.columns, self.game.columns)
+        self.assertEqual(game.faceup, self.game.faceup)
+        self.assertEqual(game.draw, self.game.draw)
+        self.assertEqual(game.deck.cards, self.game.deck.cards)
+        self.assertEqual(game.stacks, self.game.stacks)
+
+    def test_deal_number_after_loading(self):
+        game = Snapshot.unpack(Snapshot.pack(Solitaire(deal=7)))
+        self.assertEqual(game.deal_number(), Solitaire(deal=7).deal_number())
+
+    def test_deal_number_of_loaded_shuffled_game(self):
+        game = Snapshot.unpack(Snapshot.pack(Solitaire(seed=3)))
+        self.assertRaises(ValueError, game.deal_number)
+
+    def assertRejected(self, change):
+        self.assertRaises(ValueError, Snapshot.unpack,
+                          corrupt(self.data, change))
+
+    def test_short(self):
+        self.assertRaises(ValueError, Snapshot.unpack, self.data[:-1])
+
+    def test_bad_magic(self):
+        self.assertRaises(ValueError, Snapshot.unpack, "XXXX" + self.data[4:])
+
+    def test_card_out_of_range(self):
+        def change(fields): fields[CARDS] = 60
+        self.assertRejected(change)
+
+    def test_card_too_big_for_a_byte(self):
+        def change(fields): fields[CARDS] = 200
+        self.assertRejected(change)
+
+    def test_duplicate_card(self):
+        def change(fields): fields[CARDS + 1] = fields[CARDS]
+        self.assertRejected(change)
+
+    def test_too_many_cards(self):
+        def change(fields): fields[WASTE] = 52
+        self.assertRejected(change)
+
+    def test_missing_card(self):
+        def change(fields): fields[LENGTHS] -= 1
+        self.assertRejected(change)
+
+    def test_face_up_count(self):
+        def none(fields): fields[FACEUP] = 0
+        def too_many(fields): fields[FACEUP] = fields[LENGTHS] + 2
+        self.assertRejected(none)
+        self.assertRejected(too_many)
+
+    def test_bad_pile(self):
+        def change(fields): fields[PILES] = 99
+        self.assertRejected(change)
+
+    def test_bad_hint(self):
+        def off_the_board(fields):
+            fields[HINT:HINT + 4] = [0, Snapshot.NONE, Snapshot.NONE, 50]
+        def no_such_kind(fields):
+            fields[HINT:HINT + 4] = [9, 0, 1, 2]
+        self.assertRejected(off_the_board)
+        self.assertRejected(no_such_kind)
+
+    def test_hint_kept(self):
+        game = Solitaire(deal=1)
+        game.check_possible_moves()
+        self.assertNotEqual(game.hint_coords(), [])
+        loaded = Snapshot.unpack(Snapshot.pack(game))
+        self.assertEqual(loaded.hint_coords(), game.hint_coords())
+
+    def test_forged_position(self):
+        def change(fields): fields[POSITION] = 12345
+        game = Snapshot.unpack(corrupt(self.data, change))
+        self.assertEqual(game.position, self.game.position)
+        self.assertEqual(game.seen, set([self.game.position]))
+
+if __name__ == "__main__":
+    unittest.main()
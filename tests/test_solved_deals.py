@@ -0,0 +1,43 @@
+# test_solved_deals.py - The solved deal file, and growing it
+
+from Simulator import solve_batch
+from SolvedDeals import SolvedDeals
+from Solver import SolveResult, WON
+import os
+import shutil
+import tempfile
+import unittest
+
+class SolvedDealsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "deals.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_grow_keeps_results(self):
+        deals = SolvedDeals(self.path, 4)
+        deals.store(3, SolveResult(WON, [], 10, 0.0))
+        self.assertRaises(IndexError, deals.lookup, 4)
+        deals.grow(100)
+        deals.store(99, SolveResult(WON, [], 20, 0.0))
+        deals.close()
+        deals = SolvedDeals(self.path)
+        self.assertEqual(deals.capacity, 100)
+        self.assertEqual(deals.lookup(3), (WON, 0, 10))
+        self.assertEqual(deals.lookup(99), (WON, 0, 20))
+        deals.close()
+
+    def test_batch_past_capacity(self):
+        tallies = list(solve_batch(self.path, 4, 1, -2, 500, capacity=1))
+        self.assertEqual(sum(sum(tally[:3]) for tally in tallies), 2)
+        self.assertEqual(sum(tally[3] for tally in tallies), 2)
+        deals = SolvedDeals(self.path)
+        self.assertEqual(deals.capacity, 2)
+        self.assertNotEqual(deals.lookup(1), None)
+        deals.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+# This plays several autoplay policies against each other on the same deals,
+# across all CPU cores, and prints each policy's win rate (with a 95%
+# confidence interval), average moves and average time per game.
+
+from HintEngine import HintEngine
+from Policy import FirstMove, RandomMove, Greedy
+from Simulator import run_tournament, wilson
+import argparse
+
+POLICIES = {
+    "first": FirstMove,
+    "random": RandomMove,
+    "greedy": Greedy,
+    "lookahead": HintEngine,
+}
+
+parser = argparse.ArgumentParser(description="Compare autoplay policies.")
+parser.add_argument("policies", nargs="+", choices=sorted(POLICIES),
+                    help="policies to play")
+parser.add_argument("-n", "--games", type=int, default=1000,
+                    help="deals each policy plays (default 1000)")
+parser.add_argument("-f", "--first", type=int, default=1,
+                    help="first deal number to play (default 1)")
+parser.add_argument("-w", "--workers", type=int, default=None,
+                    help="worker processes (default: one per CPU)")
+args = parser.parse_args()
+
+policies = [POLICIES[name]() for name in args.policies]
+# games, wins, moves, seconds and errors for each policy
+totals = [[0, 0, 0, 0.0, 0] for policy in policies]
+
+try:
+    for index, result in run_tournament(policies, args.games, args.workers,
+                                        args.first):
+        total = totals[index]
+        if result.error is not None:
+            total[4] += 1
+            print "Deal %d failed with %s:\n%s" % (result.deal,
+                                                   policies[index].name,
+                                                   result.error)
+            continue
+        total[0] += 1
+        total[1] += result.won
+        total[2] += result.moves
+        total[3] += result.elapsed
+except KeyboardInterrupt:
+    print
+
+print "%-10s %6s %6s %8s  %-15s %7s %9s" % ("Policy", "Games", "Wins",
+                                            "Win rate", "95% interval",
+                                            "Moves", "Time")
+for policy, (games, wins, moves, elapsed, errors) in zip(policies, totals):
+    low, high = wilson(wins, games)
+    low = max(0.0, low) # rounding can leave it a hair below zero
+    print "%-10s %6d %6d %7.2f%%  %5.2f%% - %5.2f%% %7.1f %8.3fs" % (
+        policy.name, games, wins, 100.0 * wins / max(games, 1),
+        100 * low, 100 * high, float(moves) / max(games, 1),
+        elapsed / max(games, 1))
+    if errors:
+        print "%-10s %d games failed" % ("", errors)